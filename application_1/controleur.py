@@ -1,6 +1,6 @@
 import sys
 import os
-from PyQt6.QtWidgets import QApplication, QFileDialog, QMessageBox
+from PyQt6.QtWidgets import QApplication, QFileDialog, QMessageBox, QInputDialog
 from modele import ModeleMaxiMarket
 from vue import VueMaxiMarket
 
@@ -23,6 +23,7 @@ class ControleurMaxiMarket:
         self.vue.signal_nouveau_projet.connect(self.nouveau_projet)
         self.vue.signal_ouvrir_projet.connect(self.ouvrir_projet)
         self.vue.signal_sauvegarder_projet.connect(self.sauvegarder_projet)
+        self.vue.signal_enregistrer_projet_sous.connect(self.enregistrer_projet_sous)
         self.vue.signal_charger_plan.connect(self.charger_plan)
         self.vue.signal_selectionner_produits.connect(self.selectionner_produits)
         self.vue.signal_quadrillage_change.connect(self.quadrillage_change)
@@ -49,10 +50,11 @@ class ControleurMaxiMarket:
         produits = self.modele.get_produits()
         produits_magasin = produits.get_produits_magasin()
         placements = produits.get_placements()
+        revision = produits.get_revision()
         
-        self.vue.mettre_a_jour_produits(produits_magasin, placements)
-        self.vue.mettre_a_jour_table_placements(placements)
-        self.vue.afficher_placements(placements)
+        self.vue.mettre_a_jour_produits(produits_magasin, produits.get_positions_produits(), revision)
+        self.vue.mettre_a_jour_table_placements(placements, revision)
+        self.vue.afficher_placements(placements, revision)
         
         # mettre à jour les valeurs du quadrillage
         self.vue.set_quadrillage_values(plan.get_nb_rangs(), plan.get_nb_rayons())
@@ -89,12 +91,26 @@ class ControleurMaxiMarket:
             self.vue,
             "Ouvrir un projet",
             "",
-            "Fichiers JSON (*.json)"
+            "Projets MaxiMarket (*.mmk *.json *.db);;Projet binaire (*.mmk);;Fichiers JSON (*.json);;Dépôt de magasins (*.db)"
         )
         
         if fichier:
             try:
-                success = self.modele.charger_projet(fichier)
+                if fichier.lower().endswith(".db"):
+                    # dépôt de plusieurs magasins : choix du projet à ouvrir
+                    nom_projet, ok = QInputDialog.getItem(
+                        self.vue,
+                        "Ouvrir un projet",
+                        "Projet du dépôt :",
+                        self.modele.projets_depot(fichier),
+                        0,
+                        False
+                    )
+                    if not ok or not nom_projet:
+                        return
+                    success = self.modele.charger_projet_depot(fichier, nom_projet)
+                else:
+                    success = self.modele.charger_projet(fichier)
                 if success:
                     self.maj_vue()
                     
@@ -154,6 +170,31 @@ class ControleurMaxiMarket:
                 "Erreur",
                 f"Erreur lors de la sauvegarde:\n{str(e)}"
             )
+    # enregistrer le projet dans un autre fichier : binaire (.mmk), JSON (export) ou dépôt de magasins (.db)
+    def enregistrer_projet_sous(self):
+        projet = self.modele.get_projet()
+        
+        if projet.est_vide():
+            QMessageBox.warning(
+                self.vue,
+                "Avertissement",
+                "Aucun projet à sauvegarder. Créez d'abord un projet."
+            )
+            return
+        
+        fichier, filtre = QFileDialog.getSaveFileName(
+            self.vue,
+            "Enregistrer le projet sous",
+            projet.get_fichier_sauvegarde(),
+            "Projet binaire (*.mmk);;Fichiers JSON (*.json);;Dépôt de magasins (*.db)"
+        )
+        
+        if fichier:
+            if not os.path.splitext(fichier)[1]:
+                fichier += ".mmk" if "mmk" in filtre else ".db" if "db" in filtre else ".json"
+            projet.set_fichier_sauvegarde(fichier)
+            self.sauvegarder_projet()
+    
     #charger un projet (fichier Json) deja fait 
     def charger_plan(self):
         projet = self.modele.get_projet()
@@ -183,8 +224,8 @@ class ControleurMaxiMarket:
                     self.vue.mettre_a_jour_plan_info(f"Plan: {os.path.basename(fichier)}")
                     
                     # Réafficher les placements
-                    placements = self.modele.get_produits().get_placements()
-                    self.vue.afficher_placements(placements)
+                    produits = self.modele.get_produits()
+                    self.vue.afficher_placements(produits.get_placements(), produits.get_revision())
                 else:
                     QMessageBox.critical(
                         self.vue,
@@ -221,22 +262,18 @@ class ControleurMaxiMarket:
             produits.set_produits_magasin(produits_selectionnes)
             
             #mettre à jour la vue
-            placements = produits.get_placements()
-            self.vue.mettre_a_jour_produits(produits_selectionnes, placements)
-            self.vue.mettre_a_jour_table_placements(placements)
+            revision = produits.get_revision()
+            self.vue.mettre_a_jour_produits(produits.get_produits_magasin(), produits.get_positions_produits(), revision)
+            self.vue.mettre_a_jour_table_placements(produits.get_placements(), revision)
     
     def quadrillage_change(self, nb_rangs, nb_rayons):
         plan = self.modele.get_plan()
         plan.set_nb_rangs(nb_rangs)
         plan.set_nb_rayons(nb_rayons)
         
-        # mettre à jour l'affichage
+        # mettre à jour l'affichage : plan conservé, grille et placements redimensionnés
         if plan.get_pixmap():
-            self.vue.afficher_plan(plan.get_pixmap(), nb_rangs, nb_rayons)
-            
-            # reafficher le placement des produit
-            placements = self.modele.get_produits().get_placements()
-            self.vue.afficher_placements(placements)
+            self.vue.redimensionner_grille(nb_rangs, nb_rayons)
     
     def produit_selectionne_placement(self, produit):
         self.vue.set_produit_a_placer(produit)
@@ -254,10 +291,11 @@ class ControleurMaxiMarket:
         # mettre à jour la vue
         produits_magasin = produits.get_produits_magasin()
         placements = produits.get_placements()
+        revision = produits.get_revision()
         
-        self.vue.mettre_a_jour_produits(produits_magasin, placements)
-        self.vue.mettre_a_jour_table_placements(placements)
-        self.vue.afficher_placements(placements)
+        self.vue.mettre_a_jour_produits(produits_magasin, produits.get_positions_produits(), revision)
+        self.vue.mettre_a_jour_table_placements(placements, revision)
+        self.vue.afficher_placements(placements, revision)
         
         QMessageBox.information(
             self.vue,
@@ -289,7 +327,7 @@ class ControleurMaxiMarket:
             fichier = projet.get_fichier_sauvegarde()
             if os.path.exists(fichier):
                 try:
-                    os.remove(fichier)
+                    self.modele.supprimer_sauvegarde_projet()
                     
                     self.modele = ModeleMaxiMarket()
                     
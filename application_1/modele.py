@@ -1,7 +1,20 @@
 import sys
 import os
 import json
-from PyQt6.QtGui import QPixmap
+import itertools
+from types import MappingProxyType
+from projet_binaire import EXTENSION, est_projet_binaire, ecrire_projet_binaire, ProjetBinaire
+
+# modules communs aux deux applications (dossier commun/ à la racine du dépôt)
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RACINE not in sys.path:
+    sys.path.insert(0, RACINE)
+from commun.tuiles import charger_image_plan
+from commun.depot import EXTENSION_DEPOT, DepotMagasins
+
+# numéros de révision partagés par toutes les instances : un nouveau modèle
+# ne reprend jamais une révision déjà vue par les vues
+_revisions = itertools.count(1)
 
 # -----------------------------------------------------------------------------
 #  class plan
@@ -19,8 +32,9 @@ class Plan:
         if chemin_plan:
             self.__chemin_plan = chemin_plan
         
+        # QPixmap, ou pyramide de tuiles pour les très grands plans
         if os.path.exists(self.__chemin_plan):
-            self.__pixmap = QPixmap(self.__chemin_plan)
+            self.__pixmap = charger_image_plan(self.__chemin_plan)
             return True
         return False
     
@@ -60,9 +74,18 @@ class Plan:
 # -----------------------------------------------------------------------------
 class Produits:
     def __init__(self):
-        self.__produits_disponibles = {}
-        self.__produits_magasin = []
+        self.__produits_disponibles = MappingProxyType({})
+        self.__produits_magasin = ()
+        self.__ensemble_magasin = set()
         self.__placements = {} 
+        # index inverse tenu avec les placements : produit -> {(x, y): None} (cases dans l'ordre de placement)
+        self.__positions = {}
+        
+        # vues en lecture seule rendues aux appelants à la place de copies, avec le numéro
+        # de révision du contenu : il change à chaque modification
+        self.__vue_placements = MappingProxyType(self.__placements)
+        self.__revision = next(_revisions)
+        self.__positions_produits = (None, None)
         
         # charger les  produits de la liste de course
         self.charger_depuis_fichier("Ressources/produits_selectionnes.json")
@@ -71,51 +94,102 @@ class Produits:
         try:
             if os.path.exists(chemin_fichier):
                 with open(chemin_fichier, "r", encoding="utf-8") as f:
-                    self.__produits_disponibles = json.load(f)
+                    data = json.load(f)
+                self.__produits_disponibles = MappingProxyType({categorie: tuple(produits) for categorie, produits in data.items()})
+                self.__revision = next(_revisions)
                 return True
         except Exception as e:
             print(f"Erreur lors du chargement : {e}")
         return False
     
+    def get_revision(self) -> int:
+        return self.__revision
+    
     def get_categories(self) -> list:
         return list(self.__produits_disponibles.keys())
     
-    def get_produits_categorie(self, categorie: str) -> list:
-        return self.__produits_disponibles.get(categorie, [])
+    def get_produits_categorie(self, categorie: str) -> tuple:
+        return self.__produits_disponibles.get(categorie, ())
     
-    def get_tous_produits_disponibles(self) -> dict:
-        return self.__produits_disponibles.copy()
+    def get_tous_produits_disponibles(self) -> MappingProxyType:
+        return self.__produits_disponibles
     
     def set_produits_magasin(self, produits_selectionnes: list):
-        self.__produits_magasin = produits_selectionnes.copy()
+        self.__produits_magasin = tuple(produits_selectionnes)
+        self.__ensemble_magasin = set(produits_selectionnes)
         # reinitialiser le placement des produit
         self.__placements.clear()
+        self.__positions.clear()
+        self.__revision = next(_revisions)
     
-    def get_produits_magasin(self) -> list:
-        return self.__produits_magasin.copy()
+    def get_produits_magasin(self) -> tuple:
+        return self.__produits_magasin
     
     def placer_produit(self, produit: str, x: int, y: int):
-        if produit in self.__produits_magasin:
+        if produit in self.__ensemble_magasin:
+            if (x, y) in self.__placements:
+                self.__retirer_position(self.__placements[(x, y)], (x, y))
             self.__placements[(x, y)] = produit
+            self.__positions.setdefault(produit, {})[(x, y)] = None
+            self.__revision = next(_revisions)
+    
+    # placements en bloc au chargement d'un projet : cases (x, y) et produits en parallèle
+    def charger_placements(self, cases, produits):
+        self.__placements.clear()
+        self.__positions.clear()
+        for case, produit in zip(cases, produits):
+            if produit in self.__ensemble_magasin:
+                if case in self.__placements:
+                    self.__retirer_position(self.__placements[case], case)
+                self.__placements[case] = produit
+                self.__positions.setdefault(produit, {})[case] = None
+        self.__revision = next(_revisions)
+    
+    # placements déjà groupés par produit (projet binaire, chaque case une seule fois) :
+    # les deux index sont remplis par blocs
+    def charger_positions(self, positions):
+        self.__placements.clear()
+        self.__positions.clear()
+        for produit, cases in positions.items():
+            if produit in self.__ensemble_magasin:
+                cases = dict.fromkeys(cases)
+                self.__positions[produit] = cases
+                self.__placements.update(dict.fromkeys(cases, produit))
+        self.__revision = next(_revisions)
     
     def supprimer_placement(self, x: int, y: int):
         if (x, y) in self.__placements:
-            del self.__placements[(x, y)]
+            self.__retirer_position(self.__placements.pop((x, y)), (x, y))
+            self.__revision = next(_revisions)
+    
+    def __retirer_position(self, produit: str, case: tuple):
+        cases = self.__positions[produit]
+        del cases[case]
+        if not cases:
+            del self.__positions[produit]
     
-    def get_placements(self) -> dict:
-        return self.__placements.copy()
+    def get_placements(self) -> MappingProxyType:
+        return self.__vue_placements
     
     def get_produit_a_position(self, x: int, y: int) -> str:
         return self.__placements.get((x, y), "")
     
     def get_position_produit(self, produit: str) -> tuple:
-        for (x, y), p in self.__placements.items():
-            if p == produit:
-                return (x, y)
-        return None
+        return next(iter(self.__positions.get(produit, ())), None)
+    
+    def get_positions_produit(self, produit: str) -> list:
+        return list(self.__positions.get(produit, ()))
+    
+    # première case de chaque produit placé, recalculée seulement après une modification
+    def get_positions_produits(self) -> MappingProxyType:
+        revision, positions = self.__positions_produits
+        if revision != self.__revision:
+            positions = MappingProxyType({produit: next(iter(cases)) for produit, cases in self.__positions.items()})
+            self.__positions_produits = (self.__revision, positions)
+        return positions
     
     def est_produit_place(self, produit: str) -> bool:
-        return produit in self.__placements.values()
+        return produit in self.__positions
 
 # -----------------------------------------------------------------------------
 # class projet
@@ -128,6 +202,9 @@ class Projet:
         self.__nom_magasin = ""
         self.__adresse_magasin = ""
         self.__fichier_sauvegarde = ""
+        # entrée et caisse du magasin, lues par le visualiseur (None : ses valeurs par défaut)
+        self.__point_depart = None
+        self.__point_arrivee = None
     
     def creer_projet(self, nom_projet: str, auteur: str, nom_magasin: str, adresse_magasin: str):
         from datetime import datetime
@@ -136,26 +213,31 @@ class Projet:
         self.__date_creation = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         self.__nom_magasin = nom_magasin
         self.__adresse_magasin = adresse_magasin
+        self.__point_depart = None
+        self.__point_arrivee = None
         self.__fichier_sauvegarde = f"{nom_projet}.json"
     
     def charger_projet(self, chemin_fichier: str) -> bool:
         try:
             if os.path.exists(chemin_fichier):
-                with open(chemin_fichier, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                
-                self.__nom_projet = data.get("nom_projet", "")
-                self.__auteur = data.get("auteur", "")
-                self.__date_creation = data.get("date_creation", "")
-                self.__nom_magasin = data.get("nom_magasin", "")
-                self.__adresse_magasin = data.get("adresse_magasin", "")
-                self.__fichier_sauvegarde = chemin_fichier
-                
+                self.definir_donnees(self.charger_donnees_projet(chemin_fichier), chemin_fichier)
                 return True
         except Exception as e:
             print(f"Erreur lors du chargement du projet : {e}")
         return False
     
+    # informations du projet lues d'un fichier ou du dépôt
+    def definir_donnees(self, data: dict, chemin_fichier: str):
+        self.__nom_projet = data.get("nom_projet", "")
+        self.__auteur = data.get("auteur", "")
+        self.__date_creation = data.get("date_creation", "")
+        self.__nom_magasin = data.get("nom_magasin", "")
+        self.__adresse_magasin = data.get("adresse_magasin", "")
+        self.__point_depart = data.get("point_depart")
+        self.__point_arrivee = data.get("point_arrivee")
+        self.__fichier_sauvegarde = chemin_fichier
+    
+    # format choisi par l'extension du fichier : binaire (.mmk), dépôt SQLite (.db) ou JSON
     def sauvegarder_projet(self, plan: Plan, produits: Produits) -> bool:
         try:
             data = {
@@ -166,10 +248,30 @@ class Projet:
                 "adresse_magasin": self.__adresse_magasin,
                 "chemin_plan": plan.get_chemin(),
                 "nb_rangs": plan.get_nb_rangs(),
-                "nb_rayons": plan.get_nb_rayons(),
-                "produits_magasin": produits.get_produits_magasin(),
-                "placements": {f"{x},{y}": produit for (x, y), produit in produits.get_placements().items()}
+                "nb_rayons": plan.get_nb_rayons()
             }
+            if self.__point_depart is not None:
+                data["point_depart"] = list(self.__point_depart)
+            if self.__point_arrivee is not None:
+                data["point_arrivee"] = list(self.__point_arrivee)
+            
+            if self.__fichier_sauvegarde.lower().endswith(EXTENSION):
+                ecrire_projet_binaire(self.__fichier_sauvegarde, data, produits.get_produits_magasin(), produits.get_placements())
+                return True
+            
+            data["produits_magasin"] = list(produits.get_produits_magasin())
+            data["placements"] = {f"{x},{y}": produit for (x, y), produit in produits.get_placements().items()}
+            
+            if self.__fichier_sauvegarde.lower().endswith(EXTENSION_DEPOT):
+                depot = DepotMagasins(self.__fichier_sauvegarde)
+                try:
+                    # catégories des produits enregistrées avec le projet, dans la même transaction
+                    with depot.transaction():
+                        depot.definir_categories(produits.get_tous_produits_disponibles())
+                        depot.enregistrer_projet(data)
+                finally:
+                    depot.fermer()
+                return True
             
             with open(self.__fichier_sauvegarde, "w", encoding="utf-8") as f:
                 json.dump(data, f, indent=2, ensure_ascii=False)
@@ -179,8 +281,12 @@ class Projet:
             print(f"Erreur lors de la sauvegarde : {e}")
         return False
     
+    # données du projet : tout le JSON, ou seulement les métadonnées d'un projet binaire
     def charger_donnees_projet(self, chemin_fichier: str) -> dict:
         try:
+            if est_projet_binaire(chemin_fichier):
+                with ProjetBinaire(chemin_fichier) as fichier:
+                    return fichier.metadonnees
             if os.path.exists(chemin_fichier):
                 with open(chemin_fichier, "r", encoding="utf-8") as f:
                     return json.load(f)
@@ -208,6 +314,20 @@ class Projet:
     def get_adresse_magasin(self):
         return self.__adresse_magasin
     
+    # entrée du magasin (x, y), None si non définie
+    def get_point_depart(self):
+        return self.__point_depart
+    
+    def set_point_depart(self, point):
+        self.__point_depart = point
+    
+    # caisse du magasin (x, y), None si non définie
+    def get_point_arrivee(self):
+        return self.__point_arrivee
+    
+    def set_point_arrivee(self, point):
+        self.__point_arrivee = point
+    
     def get_fichier_sauvegarde(self):
         return self.__fichier_sauvegarde
     
@@ -234,29 +354,91 @@ class ModeleMaxiMarket:
     # permet d'utiliser un projet deja existant (plan du magasin / disposition des produits)
     def charger_projet(self, chemin_fichier: str) -> bool:
         if self.projet.charger_projet(chemin_fichier):
+            if est_projet_binaire(chemin_fichier):
+                return self.charger_projet_binaire(chemin_fichier)
+            
             data = self.projet.charger_donnees_projet(chemin_fichier)
             
             if data:
-                chemin_plan = data.get("chemin_plan", "")
-                if chemin_plan:
-                    self.plan.charger_plan(chemin_plan)
-                
-                self.plan.set_nb_rangs(data.get("nb_rangs", 24))
-                self.plan.set_nb_rayons(data.get("nb_rayons", 47))
+                self.restaurer_projet(data)
+                return True
+        return False
+    
+    # projet d'un dépôt SQLite de magasins, enregistré ensuite dans ce même dépôt
+    def charger_projet_depot(self, chemin_depot: str, nom_projet: str) -> bool:
+        try:
+            depot = DepotMagasins(chemin_depot)
+            try:
+                data = depot.charger_projet(nom_projet)
+            finally:
+                depot.fermer()
+            if data:
+                self.projet.definir_donnees(data, chemin_depot)
+                self.restaurer_projet(data)
+                return True
+        except Exception as e:
+            print(f"Erreur lors du chargement du projet : {e}")
+        return False
+    
+    # supprime la sauvegarde du projet : sa ligne dans un dépôt (les autres magasins restent),
+    # sinon son fichier JSON ou binaire
+    def supprimer_sauvegarde_projet(self):
+        fichier = self.projet.get_fichier_sauvegarde()
+        if fichier.lower().endswith(EXTENSION_DEPOT):
+            depot = DepotMagasins(fichier)
+            try:
+                depot.supprimer_projet(self.projet.get_nom_projet())
+            finally:
+                depot.fermer()
+        elif fichier.lower().endswith((".json", EXTENSION)):
+            os.remove(fichier)
+        else:
+            raise ValueError(f"Fichier de projet non reconnu : {fichier}")
+    
+    # noms des projets enregistrés dans un dépôt
+    def projets_depot(self, chemin_depot: str) -> list:
+        depot = DepotMagasins(chemin_depot)
+        try:
+            return [projet["nom_projet"] for projet in depot.projets()]
+        finally:
+            depot.fermer()
+    
+    # plan, produits et placements d'un projet au format JSON
+    def restaurer_projet(self, data: dict):
+        self.charger_plan_projet(data)
+        
+        # Restaurer les produits
+        produits_magasin = data.get("produits_magasin", [])
+        self.produits.set_produits_magasin(produits_magasin)
+        
+        # Restaurer les placements
+        placements_data = data.get("placements", {})
+        cases = (tuple(map(int, pos_str.split(","))) for pos_str in placements_data)
+        self.produits.charger_placements(cases, placements_data.values())
+    
+    # projet binaire : métadonnées, produits et placements lus section par section
+    def charger_projet_binaire(self, chemin_fichier: str) -> bool:
+        try:
+            with ProjetBinaire(chemin_fichier) as fichier:
+                self.charger_plan_projet(fichier.metadonnees)
                 
-                # Restaurer les produits
-                produits_magasin = data.get("produits_magasin", [])
+                produits_magasin = fichier.produits()
                 self.produits.set_produits_magasin(produits_magasin)
                 
-                # Restaurer les placements
-                placements_data = data.get("placements", {})
-                for pos_str, produit in placements_data.items():
-                    x, y = map(int, pos_str.split(","))
-                    self.produits.placer_produit(produit, x, y)
-                
-                return True
+                self.produits.charger_positions(fichier.placements())
+            return True
+        except Exception as e:
+            print(f"Erreur lors du chargement du projet : {e}")
         return False
     
+    def charger_plan_projet(self, data: dict):
+        chemin_plan = data.get("chemin_plan", "")
+        if chemin_plan:
+            self.plan.charger_plan(chemin_plan)
+        
+        self.plan.set_nb_rangs(data.get("nb_rangs", 24))
+        self.plan.set_nb_rayons(data.get("nb_rayons", 47))
+    
     #permet de sauvegarder les modifs faites sur le projet
     def sauvegarder_projet(self) -> bool:
         return self.projet.sauvegarder_projet(self.plan, self.produits)
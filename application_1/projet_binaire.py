@@ -0,0 +1,124 @@
+import sys
+import json
+import mmap
+import struct
+from array import array
+
+# Format binaire des projets MaxiMarket (le JSON reste le format d'import / export)
+#
+#   en-tête     : "MMK1", version (u16), nombre de sections (u16), taille des métadonnées (u32)
+#   métadonnées : JSON UTF-8 (nom du projet, auteur, plan, taille de la grille...)
+#   table       : par section, nom sur 4 octets, début et taille (u64)
+#   sections    : PROD noms des produits du magasin séparés par "\0"
+#                 PLAC placements groupés par produit (dans l'ordre de PROD), tableaux int32 :
+#                      x des cases, y des cases, nombre de cases de chaque produit
+#
+# Les entiers sont en petit-boutiste, chaque section commence sur 8 octets.
+# Le fichier est lu par projection mémoire : seules les sections demandées sont lues.
+
+EXTENSION = ".mmk"
+MAGIQUE = b"MMK1"
+VERSION = 1
+ENTETE = struct.Struct("<4sHHI")
+ENTREE_TABLE = struct.Struct("<4sQQ")
+
+def est_projet_binaire(chemin_fichier):
+    try:
+        with open(chemin_fichier, "rb") as f:
+            return f.read(len(MAGIQUE)) == MAGIQUE
+    except OSError:
+        return False
+
+def _entiers(valeurs):
+    tableau = array("i", valeurs)
+    if sys.byteorder != "little":
+        tableau.byteswap()
+    return tableau.tobytes()
+
+def ecrire_projet_binaire(chemin_fichier, metadonnees, produits_magasin, placements):
+    # un nom par produit : PROD et les nombres de cases de PLAC ont ainsi la même longueur
+    produits_magasin = list(dict.fromkeys(produits_magasin))
+    positions = {produit: [] for produit in produits_magasin}
+    for case, produit in placements.items():
+        # un placement ne peut porter que sur un produit du magasin (comme dans Produits)
+        if produit not in positions:
+            raise ValueError(f"Produit placé en {case} absent des produits du magasin : {produit}")
+        positions[produit].append(case)
+    cases = [case for cases_produit in positions.values() for case in cases_produit]
+
+    sections = [
+        (b"PROD", "\0".join(produits_magasin).encode("utf-8")),
+        (b"PLAC", _entiers(x for x, _ in cases) + _entiers(y for _, y in cases) + _entiers(map(len, positions.values()))),
+    ]
+
+    texte = json.dumps(metadonnees, ensure_ascii=False).encode("utf-8")
+    debut = ENTETE.size + len(texte) + ENTREE_TABLE.size * len(sections)
+    table, contenu = [], []
+    for nom, donnees in sections:
+        marge = -debut % 8
+        contenu += [b"\0" * marge, donnees]
+        debut += marge
+        table.append(ENTREE_TABLE.pack(nom, debut, len(donnees)))
+        debut += len(donnees)
+
+    with open(chemin_fichier, "wb") as f:
+        f.write(ENTETE.pack(MAGIQUE, VERSION, len(sections), len(texte)))
+        f.write(texte)
+        f.writelines(table)
+        f.writelines(contenu)
+
+# Lecture d'un projet binaire : en-tête et table lus à l'ouverture, sections copiées
+# à la demande depuis la projection (aucune vue n'est gardée sur la projection, qui peut être fermée)
+class ProjetBinaire:
+    def __init__(self, chemin_fichier):
+        with open(chemin_fichier, "rb") as f:
+            self.memoire = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magique, version, nb_sections, taille = ENTETE.unpack_from(self.memoire, 0)
+            if magique != MAGIQUE or version > VERSION:
+                raise ValueError(f"Fichier projet binaire non reconnu : {chemin_fichier}")
+            debut = ENTETE.size
+            self.metadonnees = json.loads(self.memoire[debut:debut + taille].decode("utf-8"))
+            debut += taille
+            self.sections = {}
+            for i in range(nb_sections):
+                nom, debut_section, taille_section = ENTREE_TABLE.unpack_from(self.memoire, debut + i * ENTREE_TABLE.size)
+                self.sections[nom] = (debut_section, taille_section)
+        except Exception:
+            self.memoire.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *erreur):
+        self.fermer()
+
+    def fermer(self):
+        self.memoire.close()
+
+    def section(self, nom):
+        if nom not in self.sections:
+            return b""
+        debut, taille = self.sections[nom]
+        return self.memoire[debut:debut + taille]
+
+    def produits(self):
+        donnees = self.section(b"PROD")
+        return donnees.decode("utf-8").split("\0") if donnees else []
+
+    # placements : produit -> liste des cases (x, y), construite par tranches des tableaux
+    def placements(self):
+        valeurs = array("i")
+        valeurs.frombytes(self.section(b"PLAC"))
+        if sys.byteorder != "little":
+            valeurs.byteswap()
+        produits = self.produits()
+        n = (len(valeurs) - len(produits)) // 2
+        xs, ys = valeurs[:n].tolist(), valeurs[n:2 * n].tolist()
+        positions, debut = {}, 0
+        for produit, nombre in zip(produits, valeurs[2 * n:]):
+            if nombre:
+                positions[produit] = list(zip(xs[debut:debut + nombre], ys[debut:debut + nombre]))
+                debut += nombre
+        return positions
@@ -1,7 +1,48 @@
 import sys
-from PyQt6.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QGraphicsScene, QGraphicsView, QGraphicsPixmapItem, QGraphicsLineItem, QGraphicsRectItem, QPushButton, QListWidget, QComboBox, QLabel, QSpinBox, QDialog, QFormLayout, QLineEdit, QTextEdit, QCheckBox, QGroupBox, QScrollArea, QTableWidget, QTableWidgetItem, QHeaderView, QMessageBox
+import os
+from PyQt6.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QGraphicsScene, QGraphicsView, QGraphicsItem, QGraphicsRectItem, QPushButton, QListWidget, QComboBox, QLabel, QSpinBox, QDialog, QFormLayout, QLineEdit, QTextEdit, QCheckBox, QGroupBox, QScrollArea, QTableWidget, QTableWidgetItem, QHeaderView, QMessageBox
 from PyQt6.QtGui import QPen, QColor, QBrush
-from PyQt6.QtCore import Qt, pyqtSignal
+from PyQt6.QtCore import Qt, pyqtSignal, QRectF, QLineF, QTimer
+
+# modules communs aux deux applications (dossier commun/ à la racine du dépôt)
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RACINE not in sys.path:
+    sys.path.insert(0, RACINE)
+from commun.tuiles import creer_item_plan
+
+# -----------------------------------------------------------------------------
+#  class quadrillage
+# -----------------------------------------------------------------------------
+# un seul item pour toute la grille, mis en cache : redessiné seulement au zoom
+# ou quand la grille change
+class Quadrillage(QGraphicsItem):
+    def __init__(self, largeur, hauteur, nb_rangs, nb_rayons):
+        super().__init__()
+        self.crayon = QPen(QColor(255, 0, 0))
+        self.crayon.setWidth(1)
+        self.rect = QRectF()
+        self.lignes = []
+        self.setAcceptedMouseButtons(Qt.MouseButton.NoButton)
+        self.setCacheMode(QGraphicsItem.CacheMode.DeviceCoordinateCache)
+        self.redimensionner(largeur, hauteur, nb_rangs, nb_rayons)
+    
+    def redimensionner(self, largeur, hauteur, nb_rangs, nb_rayons):
+        self.prepareGeometryChange()
+        self.rect = QRectF(0, 0, largeur, hauteur)
+        hauteur_case = hauteur / nb_rangs
+        largeur_case = largeur / nb_rayons
+        
+        # lignes horizontales puis verticales
+        self.lignes = [QLineF(0, rang * hauteur_case, largeur, rang * hauteur_case) for rang in range(nb_rangs + 1)]
+        self.lignes += [QLineF(rayon * largeur_case, 0, rayon * largeur_case, hauteur) for rayon in range(nb_rayons + 1)]
+        self.update()
+    
+    def boundingRect(self):
+        return self.rect.adjusted(-1, -1, 1, 1)
+    
+    def paint(self, painter, option, widget=None):
+        painter.setPen(self.crayon)
+        painter.drawLines(self.lignes)
 
 # -----------------------------------------------------------------------------
 #  class scene graphique
@@ -12,64 +53,91 @@ class SceneGraphique(QGraphicsScene):
     def __init__(self):
         super().__init__()
         self.plan_item = None
-        self.lignes_quadrillage = []
-        self.rectangles_produits = []
+        self.plan = None
+        self.quadrillage = None
+        self.rectangles_produits = {}
+        self.geometrie_rectangles = None
+        self.revision_placements = None
         self.produit_a_placer = None
         self.nb_rangs = 24
         self.nb_rayons = 47
     
     def afficher_plan(self, pixmap, nb_rangs, nb_rayons):
         self.clear()
-        self.lignes_quadrillage.clear()
+        self.quadrillage = None
         self.rectangles_produits.clear()
+        self.revision_placements = None
         
         self.nb_rangs = nb_rangs
         self.nb_rayons = nb_rayons
         
         if pixmap:
-            self.plan_item = QGraphicsPixmapItem(pixmap)
+            self.plan = pixmap
+            self.plan_item = creer_item_plan(pixmap)
             self.addItem(self.plan_item)
             self.setSceneRect(0, 0, pixmap.width(), pixmap.height())
             self.creer_quadrillage(pixmap.width(), pixmap.height(), nb_rangs, nb_rayons)
     
     def creer_quadrillage(self, largeur, hauteur, nb_rangs, nb_rayons):
-        hauteur_case = hauteur / nb_rangs
-        largeur_case = largeur / nb_rayons
+        # un seul item, créé une fois puis redimensionné
+        if self.quadrillage is None:
+            self.quadrillage = Quadrillage(largeur, hauteur, nb_rangs, nb_rayons)
+            self.addItem(self.quadrillage)
+        else:
+            self.quadrillage.redimensionner(largeur, hauteur, nb_rangs, nb_rayons)
+    
+    # nouvelle taille de grille : le plan est gardé, seuls la grille
+    # et les rectangles des produits sont redimensionnés
+    def redimensionner_grille(self, nb_rangs, nb_rayons):
+        self.nb_rangs = nb_rangs
+        self.nb_rayons = nb_rayons
+        if not self.plan_item:
+            return
         
-        crayon_rouge = QPen(QColor(255, 0, 0))
-        crayon_rouge.setWidth(1)
-        
-        # ligne horizontales du plan
-        for rang in range(nb_rangs + 1):
-            y_line = rang * hauteur_case
-            ligne = QGraphicsLineItem(0, y_line, largeur, y_line)
-            ligne.setPen(crayon_rouge)
-            self.addItem(ligne)
-            self.lignes_quadrillage.append(ligne)
-        
-        # lignes verticales du plan
-        for rayon in range(nb_rayons + 1):
-            x_line = rayon * largeur_case
-            ligne = QGraphicsLineItem(x_line, 0, x_line, hauteur)
-            ligne.setPen(crayon_rouge)
-            self.addItem(ligne)
-            self.lignes_quadrillage.append(ligne)
-    
-    def afficher_placements(self, placements):
-        for rect in self.rectangles_produits:
-            self.removeItem(rect)
-        self.rectangles_produits.clear()
+        largeur = self.plan.width()
+        hauteur = self.plan.height()
+        self.creer_quadrillage(largeur, hauteur, nb_rangs, nb_rayons)
         
+        largeur_case = largeur / nb_rayons
+        hauteur_case = hauteur / nb_rangs
+        for (x, y), rect in self.rectangles_produits.items():
+            rect.setRect(x * largeur_case, y * hauteur_case, largeur_case, hauteur_case)
+        self.geometrie_rectangles = (largeur, hauteur, nb_rangs, nb_rayons)
+    
+    # met à jour les rectangles par différence : seules les cases ajoutées,
+    # retirées (ou toutes si la grille a changé) touchent la scène ;
+    # rien à faire si la révision des placements est déjà affichée
+    def afficher_placements(self, placements, revision=None):
         if not self.plan_item:
+            for rect in self.rectangles_produits.values():
+                self.removeItem(rect)
+            self.rectangles_produits.clear()
+            self.revision_placements = None
+            return
+        if revision is not None and revision == self.revision_placements:
             return
+        self.revision_placements = revision
         
-        largeur = self.plan_item.pixmap().width()
-        hauteur = self.plan_item.pixmap().height()
+        largeur = self.plan.width()
+        hauteur = self.plan.height()
         largeur_case = largeur / self.nb_rayons
         hauteur_case = hauteur / self.nb_rangs
         
+        # retirer les rectangles des cases libérées
+        for case in [case for case in self.rectangles_produits if case not in placements]:
+            self.removeItem(self.rectangles_produits.pop(case))
+        
+        # grille changée : les rectangles restants sont juste redimensionnés
+        geometrie = (largeur, hauteur, self.nb_rangs, self.nb_rayons)
+        if geometrie != self.geometrie_rectangles:
+            for (x, y), rect in self.rectangles_produits.items():
+                rect.setRect(x * largeur_case, y * hauteur_case, largeur_case, hauteur_case)
+            self.geometrie_rectangles = geometrie
+        
         # ajouter nouveaux rectangles
-        for (x, y), produit in placements.items():
+        for (x, y) in placements:
+            if (x, y) in self.rectangles_produits:
+                continue
             rect_x = x * largeur_case
             rect_y = y * hauteur_case
             
@@ -78,7 +146,7 @@ class SceneGraphique(QGraphicsScene):
             rect.setPen(QPen(QColor(0, 255, 0), 2))
             
             self.addItem(rect)
-            self.rectangles_produits.append(rect)
+            self.rectangles_produits[(x, y)] = rect
     
     def set_produit_a_placer(self, produit):
         self.produit_a_placer = produit
@@ -89,8 +157,8 @@ class SceneGraphique(QGraphicsScene):
         
         #calculer position dans la grille
         pos = event.scenePos()
-        largeur = self.plan_item.pixmap().width()
-        hauteur = self.plan_item.pixmap().height()
+        largeur = self.plan.width()
+        hauteur = self.plan.height()
         
         largeur_case = largeur / self.nb_rayons
         hauteur_case = hauteur / self.nb_rangs
@@ -116,8 +184,11 @@ class VueGraphique(QGraphicsView):
         self.scene_graphique.afficher_plan(pixmap, nb_rangs, nb_rayons)
         self.fitInView(self.scene_graphique.sceneRect(), Qt.AspectRatioMode.KeepAspectRatio)
     
-    def afficher_placements(self, placements):
-        self.scene_graphique.afficher_placements(placements)
+    def afficher_placements(self, placements, revision=None):
+        self.scene_graphique.afficher_placements(placements, revision)
+    
+    def redimensionner_grille(self, nb_rangs, nb_rayons):
+        self.scene_graphique.redimensionner_grille(nb_rangs, nb_rayons)
     
     def set_produit_a_placer(self, produit):
         self.scene_graphique.set_produit_a_placer(produit)
@@ -249,6 +320,7 @@ class PanneauControle(QWidget):
     signal_nouveau_projet = pyqtSignal()
     signal_ouvrir_projet = pyqtSignal()
     signal_sauvegarder_projet = pyqtSignal()
+    signal_enregistrer_projet_sous = pyqtSignal()
     signal_supprimer_projet = pyqtSignal()
     signal_charger_plan = pyqtSignal()
     signal_selectionner_produits = pyqtSignal()
@@ -257,6 +329,8 @@ class PanneauControle(QWidget):
     
     def __init__(self):
         super().__init__()
+        # révisions des produits déjà affichées dans la liste et la table
+        self.revision_produits, self.revision_table = None, None
         self.init_ui()
     
     def init_ui(self):
@@ -269,10 +343,12 @@ class PanneauControle(QWidget):
         self.btn_nouveau_projet = QPushButton("Nouveau Projet")
         self.btn_ouvrir_projet = QPushButton("Ouvrir Projet")
         self.btn_sauvegarder_projet = QPushButton("Sauvegarder Projet")
+        self.btn_enregistrer_projet_sous = QPushButton("Enregistrer Sous...")
         
         self.btn_nouveau_projet.clicked.connect(self.signal_nouveau_projet.emit)
         self.btn_ouvrir_projet.clicked.connect(self.signal_ouvrir_projet.emit)
         self.btn_sauvegarder_projet.clicked.connect(self.signal_sauvegarder_projet.emit)
+        self.btn_enregistrer_projet_sous.clicked.connect(self.signal_enregistrer_projet_sous.emit)
         
         self.btn_supprimer_projet = QPushButton("Supprimer Projet")
         self.btn_supprimer_projet.clicked.connect(self.signal_supprimer_projet.emit)
@@ -280,6 +356,7 @@ class PanneauControle(QWidget):
         projet_layout.addWidget(self.btn_nouveau_projet)
         projet_layout.addWidget(self.btn_ouvrir_projet)
         projet_layout.addWidget(self.btn_sauvegarder_projet)
+        projet_layout.addWidget(self.btn_enregistrer_projet_sous)
         projet_layout.addWidget(self.btn_supprimer_projet)
 
         
@@ -318,6 +395,12 @@ class PanneauControle(QWidget):
         self.spin_rayons.valueChanged.connect(self.on_quadrillage_change)
         quad_layout.addWidget(self.spin_rayons)
         
+        # changements regroupés : au plus une mise à jour de la grille par image (~16 ms)
+        self.minuteur_quadrillage = QTimer(self)
+        self.minuteur_quadrillage.setSingleShot(True)
+        self.minuteur_quadrillage.setInterval(16)
+        self.minuteur_quadrillage.timeout.connect(self.emettre_quadrillage)
+        
         plan_layout.addLayout(quad_layout)
         plan_group.setLayout(plan_layout)
         layout.addWidget(plan_group)
@@ -353,6 +436,10 @@ class PanneauControle(QWidget):
         self.setLayout(layout)
     
     def on_quadrillage_change(self):
+        if not self.minuteur_quadrillage.isActive():
+            self.minuteur_quadrillage.start()
+    
+    def emettre_quadrillage(self):
         self.signal_quadrillage_change.emit(self.spin_rangs.value(), self.spin_rayons.value())
     
     def on_produit_selectionne(self, item):
@@ -368,17 +455,23 @@ class PanneauControle(QWidget):
     def mettre_a_jour_plan_info(self, info):
         self.label_plan_info.setText(info)
     
-    def mettre_a_jour_produits(self, produits_magasin, placements):
+    # positions : produit placé -> (x, y), une recherche par produit du magasin
+    def mettre_a_jour_produits(self, produits_magasin, positions, revision=None):
+        if revision is not None and revision == self.revision_produits:
+            return
+        self.revision_produits = revision
         self.liste_produits.clear()
         for produit in produits_magasin:
-            est_place = any(p == produit for p in placements.values())
-            if est_place:
-                pos = next((f"({x},{y})" for (x, y), p in placements.items() if p == produit), "")
-                self.liste_produits.addItem(f"{produit} {pos}")
+            pos = positions.get(produit)
+            if pos is not None:
+                self.liste_produits.addItem(f"{produit} ({pos[0]},{pos[1]})")
             else:
                 self.liste_produits.addItem(f"{produit} (non placé)")
     
-    def mettre_a_jour_table_placements(self, placements):
+    def mettre_a_jour_table_placements(self, placements, revision=None):
+        if revision is not None and revision == self.revision_table:
+            return
+        self.revision_table = revision
         self.table_placements.setRowCount(len(placements))
         for i, ((x, y), produit) in enumerate(placements.items()):
             self.table_placements.setItem(i, 0, QTableWidgetItem(produit))
@@ -398,6 +491,7 @@ class VueMaxiMarket(QMainWindow):
     signal_nouveau_projet = pyqtSignal()
     signal_ouvrir_projet = pyqtSignal()
     signal_sauvegarder_projet = pyqtSignal()
+    signal_enregistrer_projet_sous = pyqtSignal()
     signal_charger_plan = pyqtSignal()
     signal_selectionner_produits = pyqtSignal()
     signal_quadrillage_change = pyqtSignal(int, int)
@@ -433,6 +527,7 @@ class VueMaxiMarket(QMainWindow):
         self.panneau_controle.signal_nouveau_projet.connect(self.signal_nouveau_projet.emit)
         self.panneau_controle.signal_ouvrir_projet.connect(self.signal_ouvrir_projet.emit)
         self.panneau_controle.signal_sauvegarder_projet.connect(self.signal_sauvegarder_projet.emit)
+        self.panneau_controle.signal_enregistrer_projet_sous.connect(self.signal_enregistrer_projet_sous.emit)
         self.panneau_controle.signal_charger_plan.connect(self.signal_charger_plan.emit)
         self.panneau_controle.signal_selectionner_produits.connect(self.signal_selectionner_produits.emit)
         self.panneau_controle.signal_quadrillage_change.connect(self.signal_quadrillage_change.emit)
@@ -444,8 +539,11 @@ class VueMaxiMarket(QMainWindow):
     def afficher_plan(self, pixmap, nb_rangs, nb_rayons):
         self.vue_graphique.afficher_plan(pixmap, nb_rangs, nb_rayons)
     
-    def afficher_placements(self, placements):
-        self.vue_graphique.afficher_placements(placements)
+    def afficher_placements(self, placements, revision=None):
+        self.vue_graphique.afficher_placements(placements, revision)
+    
+    def redimensionner_grille(self, nb_rangs, nb_rayons):
+        self.vue_graphique.redimensionner_grille(nb_rangs, nb_rayons)
     
     def set_produit_a_placer(self, produit):
         self.vue_graphique.set_produit_a_placer(produit)
@@ -456,11 +554,11 @@ class VueMaxiMarket(QMainWindow):
     def mettre_a_jour_plan_info(self, info):
         self.panneau_controle.mettre_a_jour_plan_info(info)
     
-    def mettre_a_jour_produits(self, produits_magasin, placements):
-        self.panneau_controle.mettre_a_jour_produits(produits_magasin, placements)
+    def mettre_a_jour_produits(self, produits_magasin, positions, revision=None):
+        self.panneau_controle.mettre_a_jour_produits(produits_magasin, positions, revision)
     
-    def mettre_a_jour_table_placements(self, placements):
-        self.panneau_controle.mettre_a_jour_table_placements(placements)
+    def mettre_a_jour_table_placements(self, placements, revision=None):
+        self.panneau_controle.mettre_a_jour_table_placements(placements, revision)
     
     def set_quadrillage_values(self, rangs, rayons):
         self.panneau_controle.set_quadrillage_values(rangs, rayons)
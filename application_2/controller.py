@@ -24,6 +24,7 @@ class MaxiMarketController(QObject):
         # Variables
         self.tous_produits = []
         self.chemin_courant = []
+        self.chemins_preparateurs = []  # chemins affichés quand la liste est répartie
         
         # Charger projets 
         self.charger_projets_disponibles()
@@ -33,6 +34,7 @@ class MaxiMarketController(QObject):
         # Signaux contrôleur
         self.view.produit_selectionne.connect(self.selection_produit)
         self.view.ajouter_produit_demande.connect(self.ajouter_produit_liste)
+        self.view.retirer_produit_demande.connect(self.retirer_produit_liste)
         self.view.produit_liste_selectionne.connect(self.produit_liste_selectionne)
         self.view.generer_liste_demande.connect(self.generer_liste_aleatoire)
         self.view.reinitialiser_liste_demande.connect(self.reinitialiser_liste)
@@ -100,6 +102,11 @@ class MaxiMarketController(QObject):
         nom_magasin = projet.get('nom_magasin', 'Plan du magasin')
         self.view.mettre_a_jour_titre(f"MaxiMarket - {nom_magasin}")
         
+        # distances du magasin pour le calcul des trajets, entre l'entrée et la caisse du projet
+        point_depart, point_arrivee = self.projet_model.get_points_projet()
+        self.calcul_chemin.definir_points(point_depart, point_arrivee)
+        self.calcul_chemin.utiliser_matrice(self.projet_model.get_matrice_distances())
+        
         # Charger plan
         chemin_plan = projet.get("chemin_plan_absolu")
         if chemin_plan and os.path.exists(chemin_plan):
@@ -108,13 +115,9 @@ class MaxiMarketController(QObject):
                 scene.nb_rangs = projet.get("nb_rangs", 24)
                 scene.nb_rayons = projet.get("nb_rayons", 40)
                 scene.creer_quadrillage()
+                scene.definir_points(point_depart, point_arrivee)
                 
-                if "placements" in projet:
-                    scene.afficher_emplacements(
-                        projet["placements"],
-                        projet.get("nb_rangs", 24),
-                        projet.get("nb_rayons", 40)
-                    )
+                scene.afficher_emplacements(self.projet_model.get_grille_placements())
                 
                 self.view.get_rendu().fitInView(scene.sceneRect())
         
@@ -126,6 +129,7 @@ class MaxiMarketController(QObject):
         self.view.vider_liste()
         self.view.vider_table_chemin()
         self.chemin_courant = []
+        self.chemins_preparateurs = []
     
     def afficher_erreur(self, message):
         self.view.afficher_message("Erreur", message, "error")
@@ -144,6 +148,25 @@ class MaxiMarketController(QObject):
     def ajouter_produit_liste(self, produit, quantite):
         if self.produits_model.ajouter_produit_liste(produit):
             self.view.ajouter_item_liste(produit)
+            
+            # chemin affiché : insertion du produit sans tout recalculer
+            if self.chemin_courant:
+                positions = self.projet_model.get_positions_produits()
+                self.chemin_courant = self.calcul_chemin.inserer_produit(self.chemin_courant, produit, positions)
+                self.afficher_chemin_courant()
+            # chemins des préparateurs : la répartition ne vaut plus pour la nouvelle liste
+            elif self.chemins_preparateurs:
+                self.effacer_chemins()
+    
+    def retirer_produit_liste(self, produit):
+        if self.produits_model.supprimer_produit_liste(produit):
+            self.view.retirer_item_liste(produit)
+            
+            if self.chemin_courant:
+                self.chemin_courant = self.calcul_chemin.retirer_produit(self.chemin_courant, produit)
+                self.afficher_chemin_courant()
+            elif self.chemins_preparateurs:
+                self.effacer_chemins()
     
     def produit_liste_selectionne(self, produit):
         scene = self.view.get_rendu().scene()
@@ -163,20 +186,14 @@ class MaxiMarketController(QObject):
             self.view.ajouter_item_liste(produit)
         
         # Vider chemin
-        scene = self.view.get_rendu().scene()
-        scene.effacer_chemin()
-        self.view.vider_table_chemin()
-        self.chemin_courant = []
+        self.effacer_chemins()
     
     def reinitialiser_liste(self):
         self.produits_model.reinitialiser_liste()
         self.view.vider_liste()
         
         # Effacer chemin
-        scene = self.view.get_rendu().scene()
-        scene.effacer_chemin()
-        self.view.vider_table_chemin()
-        self.chemin_courant = []
+        self.effacer_chemins()
     
     def enregistrer_liste(self):
         liste_courses = self.produits_model.get_liste_courses()
@@ -191,6 +208,8 @@ class MaxiMarketController(QObject):
             nom_magasin = projet.get('nom_magasin', 'MaxiMarket') if projet else 'MaxiMarket'
             
             if self.produits_model.sauvegarder_liste(fichier, nom_magasin):
+                # projet du dépôt : la liste y est aussi gardée, sous le nom du fichier
+                self.projet_model.enregistrer_liste_depot(os.path.splitext(os.path.basename(fichier))[0], liste_courses)
                 self.view.afficher_message("Succès", "Liste enregistrée avec succès.")
             else:
                 self.view.afficher_message("Erreur", "Impossible d'enregistrer la liste.", "error")
@@ -201,30 +220,72 @@ class MaxiMarketController(QObject):
             self.view.afficher_message("Info", "La liste est vide, impossible de calculer un chemin.")
             return
         
-        # Recuperer produits
-        scene = self.view.get_rendu().scene()
-        placements = scene.coordonnees_produits
+        # Recuperer les cases des produits
+        positions = self.projet_model.get_positions_produits()
+        
+        # plusieurs préparateurs : un chemin chacun
+        nb_preparateurs = self.view.get_nb_preparateurs()
+        if nb_preparateurs > 1:
+            self.calculer_chemins_preparateurs(liste_courses, positions, nb_preparateurs)
+            return
         
         # chemin optimal
-        self.chemin_courant = self.calcul_chemin.calculer_chemin_optimal(liste_courses, placements)
+        self.chemins_preparateurs = []
+        self.chemin_courant = self.calcul_chemin.calculer_chemin_optimal(liste_courses, positions)
         
         if self.chemin_courant:
-            # Afficher chemin
-            scene.afficher_chemin(self.chemin_courant)
-            
-            # Maj table informations
-            self.view.mettre_a_jour_table_chemin(self.chemin_courant)
+            self.afficher_chemin_courant()
             
-            self.view.afficher_message("Chemin calculé",f"Le chemin a été calculé pour {len(self.chemin_courant)} produits.")
+            stats = self.calcul_chemin.statistiques
+            origine = "depuis le cache" if stats.get('depuis_cache') else f"{stats['duree_ms']:.1f} ms"
+            self.view.afficher_message("Chemin calculé",f"Le chemin a été calculé pour {len(self.chemin_courant)} produits.\n"
+                                       f"Longueur : {stats['longueur']:.0f} cases ({stats['solveur']}, {origine})")
         else:
             self.view.afficher_message("Info", "Impossible de calculer un chemin avec les produits sélectionnés.")
     
+    # Répartit la liste entre plusieurs préparateurs
+    def calculer_chemins_preparateurs(self, liste_courses, positions, nb_preparateurs):
+        chemins, stats = self.calcul_chemin.repartir_preparateurs(liste_courses, positions, nb_preparateurs)
+        self.effacer_chemins()
+        if not any(chemins):
+            self.view.afficher_message("Info", "Impossible de calculer un chemin avec les produits sélectionnés.")
+            return
+        
+        self.chemins_preparateurs = chemins
+        trajets = [self.calcul_chemin.calculer_trajet(chemin) for chemin in chemins]
+        self.view.get_rendu().scene().afficher_chemins(chemins, trajets)
+        self.view.mettre_a_jour_table_chemins(chemins)
+        
+        details = "\n".join(f"Préparateur {i + 1} : {len(chemin)} produits, {longueur:.0f} cases"
+                            for i, (chemin, longueur) in enumerate(zip(chemins, stats['longueurs'])))
+        self.view.afficher_message("Chemins calculés", f"{details}\nPlus long parcours : {stats['longueur_max']:.0f} cases")
+    
+    # Affiche le chemin courant sur le plan et dans la table
+    def afficher_chemin_courant(self):
+        scene = self.view.get_rendu().scene()
+        if self.chemin_courant:
+            trajet = self.calcul_chemin.calculer_trajet(self.chemin_courant)
+            scene.afficher_chemin(self.chemin_courant, trajet)
+            self.view.mettre_a_jour_table_chemin(self.chemin_courant)
+        else:
+            scene.effacer_chemin()
+            self.view.vider_table_chemin()
+    
+    # Efface le chemin affiché, ou ceux des préparateurs, du plan et de la table
+    def effacer_chemins(self):
+        self.view.get_rendu().scene().effacer_chemin()
+        self.view.vider_table_chemin()
+        self.chemin_courant = []
+        self.chemins_preparateurs = []
+    
     def get_view(self):
         return self.view
 
     def on_projet_combo_change(self):
         index = self.view.projet_combo.currentIndex()
         if index >= 0:
-            fichier = self.view.projet_combo.itemData(index)
-            if fichier:
-                self.charger_projet(fichier)
+            projet = self.view.projet_combo.itemData(index)
+            if projet and projet.get('depot'):
+                self.projet_model.charger_projet_depot(projet['nom_projet'])
+            elif projet:
+                self.charger_projet(projet['fichier'])
@@ -0,0 +1,119 @@
+import sys
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from modele import CalculChemin, construire_matrice_distances, indexer_positions, points_projet, SOLVEURS
+
+# Calcul des chemins de nombreuses listes de courses sans interface
+# usage : python lot_chemins.py projets/SAE_IHM.json listes.jsonl -o chemins.jsonl -j 8
+
+# état de chaque processus de calcul (initialisé une seule fois)
+_calcul, _positions, _solveur = None, None, None
+
+def _initialiser_travailleur(matrice, positions, solveur, points):
+    global _calcul, _positions, _solveur
+    _calcul = CalculChemin()
+    _calcul.definir_points(*points)
+    _calcul.utiliser_matrice(matrice)
+    _positions = positions
+    _solveur = solveur
+
+# Calcule le chemin d'une liste et retourne la ligne JSON du résultat
+def _traiter_liste(element):
+    identifiant, produits = element
+    chemin, statistiques = _calcul.calculer_tournee(produits, _positions, _solveur)
+    resultat = {
+        "liste": identifiant,
+        "chemin": [[produit, list(position)] for produit, position in chemin],
+        "manquants": [p for p in produits if p not in _positions],
+    }
+    resultat.update(statistiques)
+    return json.dumps(resultat, ensure_ascii=False)
+
+# Lit les listes : fichier .jsonl (une liste par ligne) ou JSON (liste de listes
+# ou dictionnaire nom -> liste, comme Ressources/liste_course_aleatoire.json)
+def lire_listes(chemin_fichier):
+    with open(chemin_fichier, "r", encoding="utf-8") as f:
+        if chemin_fichier.endswith(".jsonl"):
+            for numero, ligne in enumerate(f):
+                if ligne.strip():
+                    yield from _extraire_listes(json.loads(ligne), numero)
+        else:
+            yield from _extraire_listes(json.load(f), 0)
+
+def _extraire_listes(donnees, numero):
+    if isinstance(donnees, dict):
+        for nom, produits in donnees.items():
+            yield nom, produits
+    elif donnees and all(isinstance(p, str) for p in donnees):
+        yield numero, donnees
+    else:
+        for indice, produits in enumerate(donnees):
+            if isinstance(produits, dict):
+                yield from _extraire_listes(produits, indice)
+            else:
+                yield indice, produits
+
+# Découpe un itérable en blocs pour ne pas tout soumettre au pool d'un coup
+def _par_blocs(elements, taille):
+    bloc = []
+    for element in elements:
+        bloc.append(element)
+        if len(bloc) == taille:
+            yield bloc
+            bloc = []
+    if bloc:
+        yield bloc
+
+def calculer_lot(chemin_projet, chemin_listes, sortie, nb_processus=None, solveur="auto", taille_paquet=64):
+    with open(chemin_projet, "r", encoding="utf-8") as f:
+        projet = json.load(f)
+
+    # projet chargé une seule fois : le tableau des distances construit ici est copié dans chaque processus
+    # (sur un grand magasin sans tableau, chaque processus garde les paires qu'il cherche)
+    matrice = construire_matrice_distances(projet)
+    positions = indexer_positions(projet.get("placements", {}))
+    initialisation = (matrice, positions, solveur, points_projet(projet))
+    nb_processus = nb_processus or os.cpu_count() or 1
+
+    nb_listes = 0
+    listes = lire_listes(chemin_listes)
+    if nb_processus == 1:
+        _initialiser_travailleur(*initialisation)
+        for element in listes:
+            sortie.write(_traiter_liste(element) + "\n")
+            nb_listes += 1
+        return nb_listes
+
+    with ProcessPoolExecutor(nb_processus, initializer=_initialiser_travailleur, initargs=initialisation) as pool:
+        for bloc in _par_blocs(listes, taille_paquet * nb_processus * 4):
+            for ligne in pool.map(_traiter_liste, bloc, chunksize=taille_paquet):
+                sortie.write(ligne + "\n")
+            nb_listes += len(bloc)
+    return nb_listes
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Calcul des chemins de listes de courses en lot")
+    parser.add_argument("projet", help="fichier JSON du projet (plan et placements)")
+    parser.add_argument("listes", help="listes de courses (.json ou .jsonl)")
+    parser.add_argument("-o", "--sortie", help="fichier JSONL des résultats (sortie standard par défaut)")
+    parser.add_argument("-j", "--processus", type=int, default=None, help="nombre de processus (tous les coeurs par défaut)")
+    parser.add_argument("--solveur", default="auto", choices=["auto"] + list(SOLVEURS), help="solveur de tournée")
+    parser.add_argument("--paquet", type=int, default=64, help="listes envoyées à la fois à chaque processus")
+    args = parser.parse_args(arguments)
+
+    debut = time.perf_counter()
+    if args.sortie:
+        with open(args.sortie, "w", encoding="utf-8") as sortie:
+            nb_listes = calculer_lot(args.projet, args.listes, sortie, args.processus, args.solveur, args.paquet)
+    else:
+        nb_listes = calculer_lot(args.projet, args.listes, sys.stdout, args.processus, args.solveur, args.paquet)
+
+    duree = time.perf_counter() - debut
+    print(f"{nb_listes} listes traitées en {duree:.1f} s", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,30 @@
 import json
 import os
+import sys
+import hashlib
 import numpy as np
 import math
+import time
+import heapq
+import bisect
+import itertools
+import atexit
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from PyQt6.QtCore import QObject, pyqtSignal
-from PyQt6.QtGui import QPixmap
+
+# modules communs aux deux applications (dossier commun/ à la racine du dépôt)
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RACINE not in sys.path:
+    sys.path.insert(0, RACINE)
+from commun.tuiles import charger_image_plan
+from commun.depot import DepotMagasins, NOM_DEPOT
+
+# point d'entrée du magasin (quand le projet n'en donne pas)
+POINT_DEPART = (28, 21)
+# catégories des produits (nom de catégorie -> produits), pour les requêtes par catégorie sur la grille
+FICHIER_CATEGORIES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Ressources", "produits_selectionnes.json")
 
 # Fonction de copie fichier
 
@@ -17,6 +38,155 @@ def copier_fichier(source, destination):
         print(f"Erreur lors de la copie du fichier: {str(e)}")
         return False
 
+# Index produit -> cases (x, y) à partir des placements "x,y"
+def indexer_positions(placements):
+    positions = {}
+    for coord, produit in placements.items():
+        x, y = map(int, coord.split(','))
+        positions.setdefault(produit, []).append((x, y))
+    return positions
+
+# Disposition compacte des placements : noms de produits internés en entiers,
+# grille d'identifiants (nb_rangs x nb_rayons, -1 = case libre) et, calculées à la demande,
+# les cases de chaque produit rangées bout à bout (cases triées par identifiant + débuts)
+# l'index produit -> liste de cases n'est construit, depuis ces tableaux, que pour le calcul des trajets
+class GrillePlacements:
+    def __init__(self, nb_rangs, nb_rayons):
+        self.nb_rangs = nb_rangs
+        self.nb_rayons = nb_rayons
+        self.grille = np.full((nb_rangs, nb_rayons), -1, dtype=np.int32)
+        self.noms = []  # identifiant -> nom
+        self.identifiants = {}  # nom -> identifiant
+        # cases placées hors de la grille : gardées pour positions() et placements(),
+        # ignorées par les requêtes sur la grille
+        self.hors_grille = {}  # (x, y) -> identifiant
+        self.categorie_par_id = np.full(0, -1, dtype=np.int32)
+        self.categories = {}  # nom de catégorie -> indice
+        self.ordre, self.debuts = None, None
+        self.index = None
+
+    # Construction depuis les placements JSON "x,y" -> produit
+    @classmethod
+    def depuis_placements(cls, placements, nb_rangs, nb_rayons):
+        grille = cls(nb_rangs, nb_rayons)
+        for coord, produit in placements.items():
+            x, y = map(int, coord.split(','))
+            grille.placer(x, y, produit)
+        return grille
+
+    def identifiant(self, produit):
+        identifiant = self.identifiants.get(produit)
+        if identifiant is None:
+            identifiant = self.identifiants[produit] = len(self.noms)
+            self.noms.append(produit)
+        return identifiant
+
+    def dans_grille(self, x, y):
+        return 0 <= x < self.nb_rayons and 0 <= y < self.nb_rangs
+
+    def placer(self, x, y, produit):
+        if self.dans_grille(x, y):
+            self.grille[y, x] = self.identifiant(produit)
+        else:
+            self.hors_grille[(x, y)] = self.identifiant(produit)
+        self.ordre = self.index = None
+
+    def retirer(self, x, y):
+        if self.dans_grille(x, y):
+            self.grille[y, x] = -1
+        else:
+            self.hors_grille.pop((x, y), None)
+        self.ordre = self.index = None
+
+    def produit(self, x, y):
+        identifiant = self.grille[y, x] if self.dans_grille(x, y) else self.hors_grille.get((x, y), -1)
+        return self.noms[identifiant] if identifiant >= 0 else None
+
+    def nb_placements(self):
+        return int(np.count_nonzero(self.grille >= 0)) + len(self.hors_grille)
+
+    # Cases (x, y) d'un tableau d'indices à plat de la grille
+    def coordonnees(self, indices):
+        return np.column_stack((indices % self.nb_rayons, indices // self.nb_rayons))
+
+    # Cases de la grille triées par produit : celles du produit i sont ordre[debuts[i]:debuts[i + 1]]
+    def indexer(self):
+        if self.ordre is None:
+            ids = self.grille.ravel()
+            occupees = np.flatnonzero(ids >= 0).astype(np.int32)
+            self.ordre = occupees[np.argsort(ids[occupees], kind="stable")]
+            self.debuts = np.searchsorted(ids[self.ordre], np.arange(len(self.noms) + 1))
+        return self.ordre, self.debuts
+
+    # Cases (x, y) d'un produit dans la grille, tableau (n, 2)
+    def cases_produit(self, produit):
+        identifiant = self.identifiants.get(produit)
+        if identifiant is None:
+            return np.empty((0, 2), dtype=np.int64)
+        ordre, debuts = self.indexer()
+        return self.coordonnees(ordre[debuts[identifiant]:debuts[identifiant + 1]])
+
+    # Cases (x, y) de plusieurs produits d'un seul passage sur la grille
+    def cases_produits(self, produits):
+        return self.cases_identifiants([self.identifiants[produit] for produit in produits if produit in self.identifiants])
+
+    # Cases dont l'identifiant est dans ids : table booléenne par identifiant lue pour toute la grille,
+    # sa dernière entrée (False) est celle des cases libres (-1)
+    def cases_identifiants(self, ids):
+        selection = np.zeros(len(self.noms) + 1, dtype=bool)
+        selection[ids] = True
+        return self.coordonnees(np.flatnonzero(selection[self.grille.ravel()]))
+
+    # Catégories des produits (nom de catégorie -> liste de produits, comme Ressources/produits_selectionnes.json)
+    def definir_categories(self, categories):
+        self.categories = {categorie: i for i, categorie in enumerate(categories)}
+        for categorie, produits in categories.items():
+            for produit in produits:
+                self.identifiant(produit)
+        self.ordre = self.index = None
+        self.categorie_par_id = np.full(len(self.noms), -1, dtype=np.int32)
+        for categorie, produits in categories.items():
+            self.categorie_par_id[[self.identifiants[produit] for produit in produits]] = self.categories[categorie]
+
+    # Toutes les cases des produits d'une catégorie, tableau (n, 2)
+    def cases_categorie(self, categorie):
+        return self.cases_identifiants(np.flatnonzero(self.categorie_par_id == self.categories.get(categorie, -2)))
+
+    # Cases occupées du rectangle [x0, x1] x [y0, y1] (bornes incluses), tableau (n, 2)
+    def cases_occupees(self, x0=0, y0=0, x1=None, y1=None):
+        x1 = self.nb_rayons - 1 if x1 is None else x1
+        y1 = self.nb_rangs - 1 if y1 is None else y1
+        x0, y0 = max(x0, 0), max(y0, 0)
+        ys, xs = np.nonzero(self.grille[y0:y1 + 1, x0:x1 + 1] >= 0)
+        return np.column_stack((xs + x0, ys + y0))
+
+    # Index produit -> [(x, y), ...] (comme indexer_positions), construit une fois depuis indexer()
+    def positions(self):
+        if self.index is None:
+            ordre, debuts = self.indexer()
+            xs, ys = (ordre % self.nb_rayons).tolist(), (ordre // self.nb_rayons).tolist()
+            self.index = {}
+            for identifiant in np.flatnonzero(np.diff(debuts)).tolist():
+                debut, fin = int(debuts[identifiant]), int(debuts[identifiant + 1])
+                self.index[self.noms[identifiant]] = list(zip(xs[debut:fin], ys[debut:fin]))
+            for case, identifiant in self.hors_grille.items():
+                self.index.setdefault(self.noms[identifiant], []).append(case)
+        return self.index
+
+    # Placements au format JSON "x,y" -> produit
+    def placements(self):
+        ys, xs = np.nonzero(self.grille >= 0)
+        ids = self.grille[ys, xs]
+        placements = {f"{x},{y}": self.noms[i] for x, y, i in zip(xs.tolist(), ys.tolist(), ids.tolist())}
+        placements.update({f"{x},{y}": self.noms[i] for (x, y), i in self.hors_grille.items()})
+        return placements
+
+# Points de départ (entrée) et d'arrivée (caisse, optionnelle) d'un projet
+def points_projet(projet):
+    depart = tuple(projet.get("point_depart", POINT_DEPART))
+    arrivee = projet.get("point_arrivee")
+    return depart, tuple(arrivee) if arrivee is not None else None
+
 # Modele gestion projets
 class ProjetModel(QObject):    
     projet_charge = pyqtSignal(dict) 
@@ -30,6 +200,18 @@ class ProjetModel(QObject):
         if not os.path.exists(self.dossier_projets):
             os.makedirs(self.dossier_projets)
         self.pixmap = None  
+        self.matrice_distances = None
+        self.version_projet = None  # version de la disposition du projet ouvert
+        self.points = (POINT_DEPART, None)  # entrée et caisse du projet ouvert
+        self.grille_placements = None
+        self.categories = {}
+        if os.path.exists(FICHIER_CATEGORIES):
+            with open(FICHIER_CATEGORIES, "r", encoding="utf-8") as f:
+                self.categories = json.load(f)
+        
+        # dépôt SQLite des magasins de la chaîne, utilisé s'il est présent dans le dossier des projets
+        chemin_depot = os.path.join(self.dossier_projets, NOM_DEPOT)
+        self.depot = DepotMagasins(chemin_depot) if os.path.exists(chemin_depot) else None
 
     # Charge projet JSON
     def charger_projet(self, chemin_json, projet=None):
@@ -49,10 +231,21 @@ class ProjetModel(QObject):
 
             if os.path.exists(chemin_plan):
                 projet["chemin_plan_absolu"] = chemin_plan
-                self.pixmap = QPixmap(chemin_plan)
+                self.pixmap = charger_image_plan(chemin_plan)
 
             self.chemin_projet_actuel = chemin_json
             self.projet_actuel = projet
+            nb_rangs, nb_rayons = projet.get("nb_rangs", 24), projet.get("nb_rayons", 40)
+            placements = projet.get("placements", {})
+            self.grille_placements = GrillePlacements.depuis_placements(placements, nb_rangs, nb_rayons)
+            self.grille_placements.definir_categories(self.categories)
+
+            # distances du magasin construites une fois par disposition
+            self.points = points_projet(projet)
+            version = version_disposition(placements, nb_rangs, nb_rayons, self.points)
+            if self.matrice_distances is None or self.version_projet != version:
+                self.matrice_distances = construire_matrice_distances(projet, version)
+            self.version_projet = version
             self.projet_charge.emit(projet)
             return True
 
@@ -66,6 +259,47 @@ class ProjetModel(QObject):
     def get_chemin_projet_actuel(self):
         return self.chemin_projet_actuel
 
+    # Entrée et caisse (None sans caisse) du projet ouvert
+    def get_points_projet(self):
+        return self.points
+
+    def get_grille_placements(self):
+        return self.grille_placements
+
+    # Index produit -> cases du projet ouvert, le même pour la scène et le calcul des trajets
+    def get_positions_produits(self):
+        return self.grille_placements.positions() if self.grille_placements is not None else {}
+
+    # Charge un projet du dépôt, le plan étant cherché à côté du fichier du dépôt
+    def charger_projet_depot(self, nom_projet):
+        projet = self.depot.charger_projet(nom_projet) if self.depot else None
+        if projet is None:
+            self.erreur.emit(f"Projet introuvable dans le dépôt : {nom_projet}")
+            return False
+        return self.charger_projet(self.depot.chemin, projet)
+
+    def projet_vient_du_depot(self):
+        return self.depot is not None and self.chemin_projet_actuel == self.depot.chemin
+
+    # Magasins du dépôt qui vendent un produit (vide sans dépôt)
+    def magasins_avec_produit(self, produit):
+        return self.depot.magasins_avec_produit(produit) if self.depot else []
+
+    # Produits d'une catégorie d'après le dépôt (vide sans dépôt)
+    def produits_categorie(self, categorie):
+        return self.depot.produits_categorie(categorie) if self.depot else []
+
+    # Enregistre une liste de courses dans le dépôt quand le projet ouvert en vient
+    def enregistrer_liste_depot(self, nom, produits):
+        if not self.projet_vient_du_depot():
+            return False
+        self.depot.enregistrer_liste(self.projet_actuel["nom_projet"], nom, produits)
+        return True
+
+    # Matrice des distances du magasin, construite au chargement du projet
+    def get_matrice_distances(self):
+        return self.matrice_distances
+
     # Liste projets 
     def get_projets_disponibles(self):
         projets = []
@@ -87,6 +321,16 @@ class ProjetModel(QObject):
                         except:
                             pass 
 
+        # projets du dépôt : même fichier pour tous, repérés par leur nom
+        if self.depot is not None:
+            for projet in self.depot.projets():
+                projets.append({
+                    'fichier': self.depot.chemin,
+                    'nom_projet': projet['nom_projet'],
+                    'nom_magasin': projet['nom_magasin'],
+                    'depot': True
+                })
+
         return projets
 
 # Modèle gestion des produits et liste de courses
@@ -150,45 +394,1041 @@ class ProduitsModel(QObject):
             print(f"Erreur lors de la sauvegarde: {str(e)}")
             return False
 
+# cout pour traverser une case occupee par un rayon, seulement quand aucune allée ne mène à la cible
+COUT_RAYON = 10
+INFINI = np.iinfo(np.int64).max // 4
+
+# Colonnes (ou rangs, avec la grille transposée) où la disposition change, plus les bords :
+# entre deux d'entre elles toutes les colonnes sont identiques
+def _lignes_cles(libre):
+    change = np.flatnonzero(np.any(libre[:, 1:] != libre[:, :-1], axis=0))
+    return sorted(set(change.tolist()) | set((change + 1).tolist()) | {0, libre.shape[1] - 1})
+
+# Copie triée des lignes clés avec les valeurs données en plus
+def _inserer(lignes, *valeurs):
+    lignes = list(lignes)
+    for valeur in valeurs:
+        i = bisect.bisect_left(lignes, valeur)
+        if i == len(lignes) or lignes[i] != valeur:
+            lignes.insert(i, valeur)
+    return lignes
+
+# Grille du magasin : cases praticables (allées) et rayons
+# on ne marche que dans les allées : une case occupée est seulement atteinte (le produit qu'on vient
+# prendre) ou quittée ; les rayons ne sont traversés, au cout COUT_RAYON, que si aucune allée ne mène à la cible
+# les indices internes portent sur la grille entourée d'un bord de murs
+class GrilleMagasin:
+    def __init__(self, nb_rangs, nb_rayons, cases_occupees=()):
+        self.nb_rangs = nb_rangs
+        self.nb_rayons = nb_rayons
+        self.largeur = nb_rayons + 2
+        self.praticable = np.zeros((nb_rangs + 2, self.largeur), dtype=bool)
+        self.praticable[1:-1, 1:-1] = True
+        self.praticable = self.praticable.ravel()
+        for x, y in cases_occupees:
+            if self.dans_grille((x, y)):
+                self.praticable[self.indice((x, y))] = False
+
+        # cout pour entrer dans chaque case en traversant les rayons, murs jamais atteints
+        self.cout = np.where(self.praticable, 1, COUT_RAYON).astype(np.int64)
+        self.mur = np.ones(self.praticable.size, dtype=bool)
+        self.mur.reshape(nb_rangs + 2, self.largeur)[1:-1, 1:-1] = False
+        self.decalages = np.array([-1, 1, -self.largeur, self.largeur])
+        # mêmes couts en liste Python (0 pour les murs, 1 pour les allées) pour les recherches case par case
+        self.couts_cases = np.where(self.mur, 0, self.cout).tolist()
+
+        # colonnes et rangs clés : entre deux colonnes clés voisines, une allée se parcourt en ligne droite
+        libre = self.praticable.reshape(nb_rangs + 2, self.largeur)[1:-1, 1:-1]
+        self.colonnes_cles = _lignes_cles(libre)
+        self.rangs_cles = _lignes_cles(libre.T)
+        # grille bien réduite : l'A* dans les allées trouve aussi vite les trajets directs
+        self.reduite = 4 * len(self.colonnes_cles) * len(self.rangs_cles) <= nb_rangs * nb_rayons
+
+    def dans_grille(self, case):
+        x, y = case
+        return 0 <= x < self.nb_rayons and 0 <= y < self.nb_rangs
+
+    def indice(self, case):
+        x, y = case
+        return (y + 1) * self.largeur + x + 1
+
+    def case(self, indice):
+        return (int(indice % self.largeur) - 1, int(indice // self.largeur) - 1)
+
+    # Dijkstra vectorisé par paliers de distance (couts entiers 1 ou COUT_RAYON)
+    # par défaut seules les allées sont parcourues (une case occupée est atteinte, jamais traversée) ;
+    # avec rayons=True, les rayons se traversent au cout COUT_RAYON
+    # s'arrete quand les cibles sont atteintes : toutes, ou la premiere si premiere=True
+    def explorer(self, depart, cibles=None, premiere=False, rayons=False):
+        distances = np.full(self.praticable.size, INFINI, dtype=np.int64)
+        distances[self.mur] = -INFINI
+        source = self.indice(depart)
+        distances[source] = 0
+        marque = np.empty(self.praticable.size, dtype=np.int64)
+        paliers = {0: [np.array([source])]}
+
+        est_cible, restantes = None, 0
+        if cibles is not None:
+            est_cible = np.zeros(self.praticable.size, dtype=bool)
+            est_cible[list(cibles)] = True
+            restantes = int(est_cible.sum())
+
+        while paliers:
+            d = min(paliers)
+            noeuds = np.concatenate(paliers.pop(d))
+            noeuds = noeuds[distances[noeuds] == d]
+            if noeuds.size == 0:
+                continue
+
+            if est_cible is not None:
+                atteintes = est_cible[noeuds]
+                if atteintes.any():
+                    est_cible[noeuds[atteintes]] = False
+                    restantes = int(est_cible.sum())
+                    if premiere or restantes == 0:
+                        break
+
+            # dans les allées, on ne repart que des cases praticables (et de la case de départ)
+            if not rayons:
+                noeuds = noeuds[self.praticable[noeuds] | (noeuds == source)]
+            voisins = (noeuds[:, None] + self.decalages).ravel()
+            nouvelles = d + self.cout[voisins] if rayons else np.full(voisins.size, d + 1, dtype=np.int64)
+            ameliores = nouvelles < distances[voisins]
+            voisins, nouvelles = voisins[ameliores], nouvelles[ameliores]
+            if voisins.size == 0:
+                continue
+
+            # suppression des doublons sans tri
+            marque[voisins] = np.arange(voisins.size)
+            uniques = marque[voisins] == np.arange(voisins.size)
+            voisins, nouvelles = voisins[uniques], nouvelles[uniques]
+            distances[voisins] = nouvelles
+            for cout in (1, COUT_RAYON):
+                selection = voisins[nouvelles == d + cout]
+                if selection.size:
+                    paliers.setdefault(d + cout, []).append(selection)
+
+        return distances
+
+    # Distances de marche vers plusieurs cases (inf si non atteintes)
+    # en traversant les rayons, entrer dans le rayon du produit compte comme un pas
+    def distances_cases(self, distances, indices, rayons=False):
+        valeurs = distances[indices]
+        if rayons:
+            return np.where(valeurs >= INFINI, np.inf, valeurs - self.cout[indices] + 1)
+        return np.where(valeurs >= INFINI, np.inf, valeurs)
+
+    # Case sans aucune allée autour : on ne peut ni y entrer ni en sortir par les allées
+    def enclavee(self, indice):
+        return not any(self.couts_cases[indice + decalage] == 1 for decalage in (-1, 1, -self.largeur, self.largeur))
+
+    # A* en traversant les rayons (repli quand aucune allée ne mène à la cible), heuristique de Manhattan ;
+    # entrer dans la cible compte comme un pas (distance de marche vers un produit)
+    # retourne la distance de marche et les prédécesseurs
+    def a_etoile(self, source, cible):
+        couts, largeur = self.couts_cases, self.largeur
+        y_cible, x_cible = divmod(cible, largeur)
+        distances = {source: 0}
+        precedents = {source: None}
+        ouverts = [(0, 0, source)]
+        while ouverts:
+            _, moins_d, noeud = heapq.heappop(ouverts)
+            d = -moins_d
+            if d > distances[noeud]:
+                continue
+            if noeud == cible:
+                return d, precedents
+            y, x = divmod(noeud, largeur)
+            dx, dy = abs(x - x_cible), abs(y - y_cible)
+            # heuristique de chaque voisin (gauche, droite, haut, bas) déduite de celle de la case
+            for voisin, heuristique in ((noeud - 1, dy + abs(x - 1 - x_cible)), (noeud + 1, dy + abs(x + 1 - x_cible)),
+                                        (noeud - largeur, dx + abs(y - 1 - y_cible)), (noeud + largeur, dx + abs(y + 1 - y_cible))):
+                cout = couts[voisin]
+                if cout:
+                    nouvelle = d + (1 if voisin == cible else cout)
+                    if nouvelle < distances.get(voisin, INFINI):
+                        distances[voisin] = nouvelle
+                        precedents[voisin] = noeud
+                        heapq.heappush(ouverts, (nouvelle + heuristique, -nouvelle, voisin))
+        return INFINI, precedents
+
+    # A* dans les allées, sur la grille réduite aux colonnes et rangs clés plus ceux du départ et de l'arrivée :
+    # entre deux lignes gardées toutes les colonnes (rangs) sont identiques, un tronçon d'allée y est
+    # une seule arête et les distances restent exactes ; heuristique de Manhattan, à f égal
+    # les noeuds les plus avancés passent d'abord
+    # retourne la distance et le trajet (indices internes), INFINI et [] si aucune allée ne mène à l'arrivée
+    def a_etoile_allees(self, depart, arrivee):
+        couts, largeur = self.couts_cases, self.largeur
+        xs = _inserer(self.colonnes_cles, depart[0], arrivee[0])
+        ys = _inserer(self.rangs_cles, depart[1], arrivee[1])
+        nx, ny = len(xs), len(ys)
+        x_cible, y_cible = arrivee
+        source = bisect.bisect_left(ys, depart[1]) * nx + bisect.bisect_left(xs, depart[0])
+        cible = bisect.bisect_left(ys, y_cible) * nx + bisect.bisect_left(xs, x_cible)
+        distances = {source: 0}
+        precedents = {source: None}
+        ouverts = [(0, 0, source)]
+        while ouverts:
+            _, moins_d, noeud = heapq.heappop(ouverts)
+            d = -moins_d
+            if d > distances[noeud]:
+                continue
+            if noeud == cible:
+                break
+            j, i = divmod(noeud, nx)
+            x, y = xs[i], ys[j]
+            case = (y + 1) * largeur + x + 1
+            # on ne repart que des allées (et du départ) ; entre deux lignes gardées,
+            # les cases traversées sont identiques à la première
+            if couts[case] != 1 and noeud != source:
+                continue
+            voisins = []
+            if i > 0:
+                pas = x - xs[i - 1]
+                if pas == 1 or couts[case - 1] == 1:
+                    voisins.append((noeud - 1, case - pas, pas, xs[i - 1], y))
+            if i < nx - 1:
+                pas = xs[i + 1] - x
+                if pas == 1 or couts[case + 1] == 1:
+                    voisins.append((noeud + 1, case + pas, pas, xs[i + 1], y))
+            if j > 0:
+                pas = y - ys[j - 1]
+                if pas == 1 or couts[case - largeur] == 1:
+                    voisins.append((noeud - nx, case - pas * largeur, pas, x, ys[j - 1]))
+            if j < ny - 1:
+                pas = ys[j + 1] - y
+                if pas == 1 or couts[case + largeur] == 1:
+                    voisins.append((noeud + nx, case + pas * largeur, pas, x, ys[j + 1]))
+            for voisin, case_voisin, pas, vx, vy in voisins:
+                if couts[case_voisin] == 1 or voisin == cible:
+                    nouvelle = d + pas
+                    if nouvelle < distances.get(voisin, INFINI):
+                        distances[voisin] = nouvelle
+                        precedents[voisin] = noeud
+                        heapq.heappush(ouverts, (nouvelle + abs(vx - x_cible) + abs(vy - y_cible), -nouvelle, voisin))
+        else:
+            return INFINI, []
+
+        # noeuds du trajet puis cases de chaque tronçon en ligne droite
+        noeuds = [cible]
+        while precedents[noeuds[-1]] is not None:
+            noeuds.append(precedents[noeuds[-1]])
+        trajet = [self.indice(depart)]
+        for noeud in reversed(noeuds[:-1]):
+            j, i = divmod(noeud, nx)
+            fin = (ys[j] + 1) * largeur + xs[i] + 1
+            ecart = fin - trajet[-1]
+            pas = (1 if ecart > 0 else -1) if abs(ecart) < largeur else (largeur if ecart > 0 else -largeur)
+            trajet.extend(range(trajet[-1] + pas, fin + pas, pas))
+        return distances[cible], trajet
+
+    # Trajet sans détour par les allées (chaque pas rapproche de la cible), cherché en profondeur
+    # avec un nombre d'étapes borné : sa longueur est la distance de Manhattan, donc minimale
+    # retourne les indices du trajet, ou None
+    def trajet_direct(self, source, cible, max_etapes):
+        couts, largeur = self.couts_cases, self.largeur
+        y_source, x_source = divmod(source, largeur)
+        y_cible, x_cible = divmod(cible, largeur)
+        pas_x = 1 if x_cible > x_source else -1
+        pas_y = largeur if y_cible > y_source else -largeur
+        nb_x, nb_y = abs(x_cible - x_source), abs(y_cible - y_source)
+        trajet, avancees, impasses = [source], [(0, 0)], set()
+        while trajet and max_etapes > 0:
+            max_etapes -= 1
+            noeud, (i, j) = trajet[-1], avancees[-1]
+            if noeud == cible:
+                return trajet
+            for suivant, avancee, possible in ((noeud + pas_x, (i + 1, j), i < nb_x), (noeud + pas_y, (i, j + 1), j < nb_y)):
+                if possible and suivant not in impasses and (couts[suivant] == 1 or suivant == cible):
+                    trajet.append(suivant)
+                    avancees.append(avancee)
+                    break
+            else:
+                impasses.add(trajet.pop())
+                avancees.pop()
+        return None
+
+    # Distance de marche et trajet (indices internes) entre deux cases ((inf, []) si inatteignable) :
+    # trajet direct s'il existe (cherché seulement si la grille se réduit mal), sinon A* dans les allées ; si aucune allée ne mène à la cible
+    # (rayon enclavé), A* en traversant les rayons
+    def chercher(self, depart, arrivee):
+        if not self.dans_grille(depart) or not self.dans_grille(arrivee):
+            return float('inf'), []
+        source, cible = self.indice(depart), self.indice(arrivee)
+        manhattan = abs(depart[0] - arrivee[0]) + abs(depart[1] - arrivee[1])
+        if not self.reduite:
+            trajet = self.trajet_direct(source, cible, 2 * manhattan + 1)
+            if trajet is not None:
+                return manhattan, trajet
+        if not self.enclavee(source) and not self.enclavee(cible):
+            d, trajet = self.a_etoile_allees(depart, arrivee)
+            if d < INFINI:
+                return d, trajet
+        d, precedents = self.a_etoile(source, cible)
+        if d >= INFINI:
+            return float('inf'), []
+        trajet = [cible]
+        while precedents[trajet[-1]] is not None:
+            trajet.append(precedents[trajet[-1]])
+        trajet.reverse()
+        return d, trajet
+
+    # Distance de marche entre deux cases
+    def distance(self, depart, arrivee):
+        return self.chercher(depart, arrivee)[0]
+
+    # Champ complet des distances de marche depuis une case, tableau (nb_rangs, nb_rayons)
+    # (en traversant les rayons pour les cases qu'aucune allée ne relie à la source)
+    def champ_distances(self, source):
+        interieur = np.flatnonzero(~self.mur)
+        champ = self.distances_cases(self.explorer(source), interieur)
+        isolees = np.isinf(champ)
+        if isolees.any():
+            champ[isolees] = self.distances_cases(self.explorer(source, rayons=True), interieur[isolees], rayons=True)
+        champ[interieur == self.indice(source)] = 0
+        return champ.reshape(self.nb_rangs, self.nb_rayons)
+
+    def plus_court_chemin(self, depart, arrivee):
+        return [self.case(i) for i in self.chercher(depart, arrivee)[1]]
+
+# Version d'une disposition : change dès que les placements, la grille ou les points changent
+def version_disposition(placements, nb_rangs, nb_rayons, points=None):
+    contenu = json.dumps([nb_rangs, nb_rayons, sorted(placements.items()), points], ensure_ascii=False)
+    return hashlib.sha1(contenu.encode("utf-8")).hexdigest()
+
+# Matrice des distances d'un projet chargé (dictionnaire JSON)
+def construire_matrice_distances(projet, version=None):
+    nb_rangs = projet.get("nb_rangs", 24)
+    nb_rayons = projet.get("nb_rayons", 40)
+    placements = projet.get("placements", {})
+    depart, arrivee = points_projet(projet)
+    if version is None:
+        version = version_disposition(placements, nb_rangs, nb_rayons, (depart, arrivee))
+    cases = [tuple(map(int, coord.split(','))) for coord in placements]
+    grille = GrilleMagasin(nb_rangs, nb_rayons, cases)
+    ancres = [depart] + ([arrivee] if arrivee is not None else [])
+    return MatriceDistances(grille, version, ancres, cases)
+
+# nombre de trajets case par case gardés par une matrice de distances
+TAILLE_TRAJETS = 1024
+
+# nombre de paires gardées quand les distances ne sont pas précalculées
+TAILLE_DISTANCES = 200_000
+
+# le tableau des distances n'est construit au chargement que jusqu'à ce produit
+# (cases à relier x cases de la grille) : au-delà il faudrait plus d'une seconde environ
+SEUIL_PRECALCUL = 1_000_000
+
+# Distances de marche entre les points du magasin, construites au chargement du projet :
+# sur une grille assez petite, tableau NumPy de toutes les paires entre les cases placées et les ancres
+# (entrée, caisse), une exploration par case ; sinon chaque paire est cherchée à sa première demande
+# (A*) et seules les plus récentes sont gardées
+# (les trajets des dernières paires cherchées sont gardés pour l'affichage du chemin)
+# chaque ancre a en plus son champ de distances vers toutes les cases, calculé au chargement :
+# les distances depuis l'entrée et vers la caisse y sont lues directement
+class MatriceDistances:
+    def __init__(self, grille, version=None, ancres=(), cases=()):
+        self.grille = grille
+        self.version = version
+        self.ancres = [tuple(ancre) for ancre in ancres]
+        self.index = {}  # case -> ligne de valeurs
+        self.valeurs = None
+        self.connues = OrderedDict()  # (case, case) -> distance, hors tableau
+        self.trajets = OrderedDict()  # (case, case) -> trajet en indices de la grille
+        self.champs = {ancre: grille.champ_distances(ancre) for ancre in self.ancres if grille.dans_grille(ancre)}
+
+        points = [case for case in dict.fromkeys(self.ancres + [tuple(case) for case in cases]) if grille.dans_grille(case)]
+        if len(points) * grille.praticable.size <= SEUIL_PRECALCUL:
+            self.precalculer(points)
+
+    # Tableau des distances entre tous les points donnés : lignes des ancres lues dans leur champ,
+    # puis une exploration des allées par autre point, arretée quand tous sont atteints
+    def precalculer(self, points):
+        self.index = {case: i for i, case in enumerate(points)}
+        indices = np.array([self.grille.indice(case) for case in points], dtype=np.int64)
+        xs, ys = [x for x, _ in points], [y for _, y in points]
+        self.valeurs = np.empty((len(points), len(points)), dtype=np.float64)
+        for i, case in enumerate(points):
+            if case in self.champs:
+                self.valeurs[i] = self.champs[case][ys, xs]
+                continue
+            ligne = self.grille.distances_cases(self.grille.explorer(case, indices), indices)
+            # aucune allée vers certains points : repli en traversant les rayons
+            isoles = np.isinf(ligne)
+            if isoles.any():
+                distances = self.grille.explorer(case, indices[isoles], rayons=True)
+                ligne[isoles] = self.grille.distances_cases(distances, indices[isoles], rayons=True)
+            self.valeurs[i] = ligne
+        np.fill_diagonal(self.valeurs, 0)
+
+    def distance(self, pos1, pos2):
+        if not self.grille.dans_grille(pos1) or not self.grille.dans_grille(pos2):
+            return None
+        if pos1 in self.index and pos2 in self.index:
+            return float(self.valeurs[self.index[pos1], self.index[pos2]])
+        if pos1 in self.champs or pos2 in self.champs:
+            ancre, case = (pos1, pos2) if pos1 in self.champs else (pos2, pos1)
+            return float(self.champs[ancre][case[1], case[0]])
+        cle = (pos1, pos2) if pos1 <= pos2 else (pos2, pos1)
+        if cle in self.connues:
+            self.connues.move_to_end(cle)
+        else:
+            self.chercher(pos1, pos2)
+        return self.connues[cle]
+
+    # Trajet case par case entre deux cases, repris des dernières recherches
+    def trajet(self, pos1, pos2):
+        if (pos1, pos2) in self.trajets:
+            self.trajets.move_to_end((pos1, pos2))
+            indices = self.trajets[(pos1, pos2)]
+        elif (pos2, pos1) in self.trajets:
+            self.trajets.move_to_end((pos2, pos1))
+            indices = self.trajets[(pos2, pos1)][::-1]
+        else:
+            indices = self.chercher(pos1, pos2)
+        return [self.grille.case(i) for i in indices]
+
+    def chercher(self, pos1, pos2):
+        distance, trajet = self.grille.chercher(pos1, pos2)
+        # le trajet retour passe par les mêmes cases : distance symétrique
+        self.connues[(pos1, pos2) if pos1 <= pos2 else (pos2, pos1)] = float(distance)
+        while len(self.connues) > TAILLE_DISTANCES:
+            self.connues.popitem(last=False)
+        self.trajets[(pos1, pos2)] = trajet
+        while len(self.trajets) > TAILLE_TRAJETS:
+            self.trajets.popitem(last=False)
+        return trajet
+
+    # Distances entre toutes les cases données : exactes pour les cases du tableau, les ancres
+    # et les paires déjà cherchées, minorées par la distance de Manhattan pour les autres (inf pour une case hors grille)
+    def minorants(self, cases):
+        x, y = np.array(cases, dtype=np.float64).reshape(-1, 2).T
+        valeurs = np.abs(x[:, None] - x[None, :]) + np.abs(y[:, None] - y[None, :])
+        hors = [i for i, case in enumerate(cases) if not self.grille.dans_grille(case)]
+        valeurs[hors, :] = np.inf
+        valeurs[:, hors] = np.inf
+
+        lignes = [i for i, case in enumerate(cases) if case in self.index]
+        if lignes:
+            rangs = [self.index[cases[i]] for i in lignes]
+            valeurs[np.ix_(lignes, lignes)] = self.valeurs[np.ix_(rangs, rangs)]
+
+        # lignes de l'entrée et de la caisse (ligne 0 et dernière ligne des couts) lues dans leur champ
+        dedans = [i for i in range(len(cases)) if i not in hors]
+        for i, case in enumerate(cases):
+            if case in self.champs:
+                champ = self.champs[case][[cases[j][1] for j in dedans], [cases[j][0] for j in dedans]]
+                valeurs[i, dedans] = valeurs[dedans, i] = champ
+
+        if self.connues:
+            for i, case in enumerate(cases):
+                for j in range(i + 1, len(cases)):
+                    d = self.connues.get((case, cases[j]) if case <= cases[j] else (cases[j], case))
+                    if d is not None:
+                        valeurs[i, j] = valeurs[j, i] = d
+        np.fill_diagonal(valeurs, 0)
+        return valeurs
+
+# nombre de voisins essayés par la recherche locale
+NB_VOISINS = 12
+
+# Solveurs de tournée : couts[0] est le point de départ, chemin ouvert
+# si fin=True, le dernier noeud de couts est le point d'arrivée, visité en dernier
+# chaque solveur retourne l'ordre de visite des produits 1..n
+
+# Longueur d'une tournée partant du noeud 0 (et finissant au dernier noeud si fin)
+def longueur_tournee(couts, ordre, fin=False):
+    tournee = [0] + list(ordre) + ([len(couts) - 1] if fin else [])
+    return float(sum(couts[a, b] for a, b in zip(tournee, tournee[1:])))
+
+# Plus proche voisin
+def solveur_glouton(couts, fin=False):
+    n = len(couts) - 1 - fin
+    restants = np.ones(len(couts), dtype=bool)
+    restants[0] = False
+    if fin:
+        restants[-1] = False
+    ordre, courant = [], 0
+    for _ in range(n):
+        ligne = np.where(restants, couts[courant], np.inf)
+        courant = int(np.argmin(ligne))
+        restants[courant] = False
+        ordre.append(courant)
+    return ordre
+
+# Programmation dynamique de Held-Karp (exacte, O(2^n n^2))
+def solveur_held_karp(couts, fin=False):
+    n = len(couts) - 1 - fin
+    if n <= 1:
+        return list(range(1, n + 1))
+
+    c = couts[1:n + 1, 1:n + 1]
+    masques = np.arange(1 << n)
+    appartient = (masques[:, None] >> np.arange(n)) & 1 == 1
+    tailles = appartient.sum(axis=1)
+    dp = np.full((1 << n, n), np.inf)
+    dp[1 << np.arange(n), np.arange(n)] = couts[0, 1:n + 1]
+
+    # extension de tous les sous-ensembles d'une même taille à la fois
+    for taille in range(1, n):
+        sous_ensembles = masques[tailles == taille]
+        candidats = (dp[sous_ensembles][:, :, None] + c[None, :, :]).min(axis=1)
+        suivants = sous_ensembles[:, None] | (1 << np.arange(n))[None, :]
+        libres = ~appartient[sous_ensembles]
+        colonnes = np.broadcast_to(np.arange(n), libres.shape)
+        np.minimum.at(dp, (suivants[libres], colonnes[libres]), candidats[libres])
+
+    # reconstruction en remontant depuis le meilleur dernier noeud
+    masque = (1 << n) - 1
+    retour = couts[1:n + 1, n + 1] if fin else 0
+    dernier = int(np.argmin(dp[masque] + retour))
+    ordre = [dernier]
+    while masque != 1 << dernier:
+        precedent_masque = masque ^ (1 << dernier)
+        valeurs = dp[precedent_masque] + c[:, dernier]
+        valeurs[~appartient[precedent_masque]] = np.inf
+        masque, dernier = precedent_masque, int(np.argmin(valeurs))
+        ordre.append(dernier)
+    return [i + 1 for i in reversed(ordre)]
+
+# Plus proche voisin amélioré par recherche locale 2-opt puis Or-opt
+# les mouvements ne sont essayés que vers les plus proches voisins de chaque noeud
+def solveur_2opt(couts, fin=False, max_passes=50, nb_voisins=NB_VOISINS):
+    tournee = np.array([0] + solveur_glouton(couts, fin) + ([len(couts) - 1] if fin else []))
+    voisins = plus_proches_voisins(couts, nb_voisins)
+    tournee = recherche_locale(couts, tournee, voisins, fin, max_passes)
+    return tournee[1:len(tournee) - fin].tolist()
+
+# Passes 2-opt / Or-opt jusqu'à ce qu'aucun mouvement n'améliore la tournée
+def recherche_locale(couts, tournee, voisins, fin=False, max_passes=50):
+    for _ in range(max_passes):
+        ameliore_2opt = _passe_2opt(couts, tournee, voisins, fin)
+        tournee, ameliore_or = _passe_or_opt(couts, tournee, voisins, fin)
+        if not (ameliore_2opt or ameliore_or):
+            break
+    return tournee
+
+# k plus proches voisins de chaque noeud (le départ n'est jamais candidat)
+def plus_proches_voisins(couts, k):
+    c = couts.copy()
+    np.fill_diagonal(c, np.inf)
+    c[:, 0] = np.inf
+    k = max(1, min(k, len(c) - 2))
+    voisins = np.argpartition(c, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(voisins, np.argsort(np.take_along_axis(c, voisins, 1), 1), 1)
+
+# Inverse le segment [i..j] quand la nouvelle arête (t[i-1], t[j]) relie deux voisins
+# (avec fin=True, le dernier noeud de la tournée ne bouge jamais)
+def _passe_2opt(couts, tournee, voisins, fin=False):
+    ameliore = False
+    n = len(tournee) - 1
+    mobiles = n - fin
+    rang = np.empty(len(couts), dtype=np.int64)
+    rang[tournee] = np.arange(n + 1)
+    for i in range(1, mobiles):
+        a, b = tournee[i - 1], tournee[i]
+        j = rang[voisins[a]]
+        j = j[(j > i) & (j <= mobiles)]
+        if j.size == 0:
+            continue
+        c_ = tournee[j]
+        d_ = tournee[np.minimum(j + 1, n)]
+        gain = couts[a, c_] - couts[a, b] + np.where(j < n, couts[b, d_] - couts[c_, d_], 0)
+        k = int(np.argmin(gain))
+        if gain[k] < -1e-9:
+            dernier = j[k]
+            tournee[i:dernier + 1] = tournee[i:dernier + 1][::-1].copy()
+            rang[tournee[i:dernier + 1]] = np.arange(i, dernier + 1)
+            ameliore = True
+    return ameliore
+
+# Déplace des segments de 1 à 3 noeuds juste après un voisin de leur premier noeud
+def _passe_or_opt(couts, tournee, voisins, fin=False):
+    ameliore = False
+    n = len(tournee) - 1
+    mobiles = n - fin
+    for longueur in (1, 2, 3):
+        rang = np.empty(len(couts), dtype=np.int64)
+        rang[tournee] = np.arange(n + 1)
+        i = 1
+        while i + longueur - 1 <= mobiles:
+            premier, dernier = tournee[i], tournee[i + longueur - 1]
+            avant = tournee[i - 1]
+            retrait = couts[avant, premier]
+            if i + longueur <= n:
+                apres = tournee[i + longueur]
+                retrait += couts[dernier, apres] - couts[avant, apres]
+
+            # insertion entre u = t[p] et v = t[p + 1], hors du segment
+            p = rang[voisins[premier]]
+            p = p[((p < i - 1) | (p >= i + longueur)) & (p <= mobiles)]
+            if p.size:
+                u = tournee[p]
+                v = tournee[np.minimum(p + 1, n)]
+                ajout = couts[u, premier] + np.where(p < n, couts[dernier, v] - couts[u, v], 0)
+                k = int(np.argmin(ajout))
+                if ajout[k] - retrait < -1e-9:
+                    segment = tournee[i:i + longueur]
+                    reste = np.concatenate((tournee[:i], tournee[i + longueur:]))
+                    position = p[k] + 1 if p[k] < i else p[k] + 1 - longueur
+                    tournee = np.concatenate((reste[:position], segment, reste[position:]))
+                    rang[tournee] = np.arange(n + 1)
+                    ameliore = True
+            i += 1
+    return tournee, ameliore
+
+SOLVEURS = {
+    "glouton": solveur_glouton,
+    "held_karp": solveur_held_karp,
+    "2opt": solveur_2opt,
+}
+LIMITE_HELD_KARP = 15
+# taille de liste à partir de laquelle les préparateurs sont calculés en parallèle
+SEUIL_PARALLELE = 60
+# passes de recherche locale après ajout ou retrait d'un produit
+MAX_PASSES_REPARATION = 3
+# résolutions au plus d'une tournée dont des tronçons se révèlent plus longs que leur minorant
+MAX_AFFINAGES = 10
+
+# Cache LRU des chemins : clé = produits (ensemble), départ, solveur et version de la disposition
+class CacheChemins:
+    def __init__(self, taille_max=512):
+        self.taille_max = taille_max
+        self.entrees = OrderedDict()
+        self.version = None
+        self.succes = 0
+        self.echecs = 0
+
+    # Change de disposition : les chemins de l'ancienne sont tous évincés
+    def definir_version(self, version):
+        if version != self.version:
+            self.entrees.clear()
+            self.version = version
+
+    def cle(self, produits, points, solveur):
+        return (frozenset(produits), tuple(points), solveur, self.version)
+
+    def obtenir(self, cle):
+        if cle in self.entrees:
+            self.entrees.move_to_end(cle)
+            self.succes += 1
+            return self.entrees[cle]
+        self.echecs += 1
+        return None
+
+    def ajouter(self, cle, valeur):
+        self.entrees[cle] = valeur
+        self.entrees.move_to_end(cle)
+        while len(self.entrees) > self.taille_max:
+            self.entrees.popitem(last=False)
+
+    def vider(self):
+        self.entrees.clear()
+        self.succes = self.echecs = 0
+
+    def taux_succes(self):
+        total = self.succes + self.echecs
+        return self.succes / total if total else 0.0
+
+    def get_statistiques(self):
+        return {"succes": self.succes, "echecs": self.echecs,
+                "taux_succes": self.taux_succes(), "taille": len(self.entrees)}
+
+# Solveur effectif pour n produits ("auto" : exact si la liste est courte)
+def choisir_solveur(solveur, n):
+    if solveur == "auto":
+        return "held_karp" if n <= LIMITE_HELD_KARP else "2opt"
+    if solveur not in SOLVEURS:
+        raise ValueError(f"Solveur inconnu : {solveur}")
+    return solveur
+
+def _resoudre_sous_probleme(sous_probleme):
+    couts, solveur, fin = sous_probleme
+    return SOLVEURS[solveur](couts, fin)
+
+# Pool de processus des grandes répartitions, créé au premier besoin puis gardé jusqu'à la sortie
+# démarrage "spawn" : jamais de fork du processus Qt, où des fils de calcul peuvent tourner
+_pool_repartition = None
+
+def _pool_processus():
+    global _pool_repartition
+    if _pool_repartition is None:
+        _pool_repartition = ProcessPoolExecutor(os.cpu_count(), mp_context=multiprocessing.get_context("spawn"))
+        atexit.register(_pool_repartition.shutdown)
+    return _pool_repartition
+
+# Découpe une tournée en k segments consécutifs (chacun partant du noeud 0,
+# et finissant au dernier noeud si fin) minimisant le plus long segment :
+# programmation dynamique sur les sommes préfixes
+def decouper_tournee(couts, tournee, k, fin=False):
+    t = np.array(tournee)
+    n = len(t)
+    k = min(k, n)
+    if n == 0:
+        return []
+    prefixe = np.concatenate(([0.0, 0.0], np.cumsum(couts[t[:-1], t[1:]])))
+    acces = couts[0, t]
+    retour = couts[t, len(couts) - 1] if fin else np.zeros(n)
+
+    # meilleur[q, b] : plus long segment en découpant les b premiers noeuds en q segments
+    meilleur = np.full((k + 1, n + 1), np.inf)
+    coupure = np.zeros((k + 1, n + 1), dtype=np.int64)
+    meilleur[0, 0] = 0.0
+    for q in range(1, k + 1):
+        for b in range(q, n + 1):
+            a = np.arange(q, b + 1)
+            segment = acces[a - 1] + prefixe[b] - prefixe[a] + retour[b - 1]
+            valeurs = np.maximum(meilleur[q - 1, a - 1], segment)
+            j = int(np.argmin(valeurs))
+            meilleur[q, b], coupure[q, b] = valeurs[j], a[j]
+
+    segments, b = [], n
+    for q in range(k, 0, -1):
+        a = coupure[q, b]
+        segments.append(tournee[a - 1:b])
+        b = a - 1
+    return [list(segment) for segment in reversed(segments)]
+
 # calcul chemin optimal
 class CalculChemin:
-    def __init__(self, point_depart=(29, 3)): 
+    def __init__(self, point_depart=POINT_DEPART, grille=None, taille_cache=512, point_arrivee=None): 
         self.point_depart = point_depart
+        self.point_arrivee = point_arrivee
+        self.grille = grille
+        self.matrice = MatriceDistances(grille) if grille is not None else None
+        self.statistiques = {}
+        self.cache = CacheChemins(taille_cache)
+
+    # Construit la grille de déplacement et ses distances à partir de l'index des positions
+    def definir_grille(self, nb_rangs, nb_rayons, positions):
+        cases = [case for cases_produit in positions.values() for case in cases_produit]
+        placements = {f"{x},{y}": produit for produit, cases_produit in positions.items() for x, y in cases_produit}
+        version = version_disposition(placements, nb_rangs, nb_rayons, self.points())
+        ancres = [point for point in self.points() if point is not None]
+        self.utiliser_matrice(MatriceDistances(GrilleMagasin(nb_rangs, nb_rayons, cases), version, ancres, cases))
 
-    # Calcule distance euclidienne
+    # Points de départ et d'arrivée des tournées (sans arrivée, le chemin reste ouvert)
+    def definir_points(self, point_depart, point_arrivee=None):
+        self.point_depart = tuple(point_depart)
+        self.point_arrivee = tuple(point_arrivee) if point_arrivee is not None else None
+
+    def points(self):
+        return self.point_depart, self.point_arrivee
+
+    # Étapes fixes d'un chemin : départ, produits puis arrivée éventuelle
+    def etapes(self, chemin):
+        fin = [self.point_arrivee] if self.point_arrivee is not None else []
+        return [self.point_depart] + [position for _, position in chemin] + fin
+
+    # Utilise une matrice de distances (et sa grille), partagée avec le modèle du projet
+    def utiliser_matrice(self, matrice):
+        self.matrice = matrice
+        self.grille = matrice.grille if matrice is not None else None
+        self.cache.definir_version(matrice.version if matrice is not None else None)
+
+    # Calcule distance de marche (euclidienne si aucune grille)
     def calculer_distance(self, pos1, pos2):
+        if self.matrice is not None:
+            distance = self.matrice.distance(pos1, pos2)
+            return distance if distance is not None else float('inf')
+        if self.grille is not None:
+            return self.grille.distance(pos1, pos2)
         x1, y1 = pos1
         x2, y2 = pos2
         return math.sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
 
+    # Distances entre toutes les cases données : minorants de la matrice (exactes une fois calculées),
+    # sinon euclidiennes
+    def _distances_cases(self, cases):
+        if self.matrice is not None:
+            return self.matrice.minorants(cases)
+
+        x, y = np.array(cases, dtype=np.float64).T
+        return np.hypot(x[:, None] - x[None, :], y[:, None] - y[None, :])
+
     # Algorithme pour les produits dans l'ordre le plus court
-    def calculer_chemin_optimal(self, produits, positions):
+    # positions : index produit -> liste de cases (voir indexer_positions)
+    def calculer_chemin_optimal(self, produits, positions, solveur="auto"):
+        chemin, self.statistiques = self.calculer_tournee(produits, positions, solveur)
+        return chemin
+
+    # Tournée avec le solveur choisi : retourne (chemin, statistiques)
+    # les listes déjà vues sur la même disposition sont lues dans le cache
+    def calculer_tournee(self, produits, positions, solveur="auto"):
+        # sans version de disposition, impossible de savoir si le cache est encore valable
+        if self.cache.version is None:
+            chemin, statistiques = self._resoudre_tournee(produits, positions, solveur)
+            return chemin, dict(statistiques, depuis_cache=False)
+
+        cle = self.cache.cle(produits, self.points(), solveur)
+        resultat = self.cache.obtenir(cle)
+        if resultat is None:
+            resultat = self._resoudre_tournee(produits, positions, solveur)
+            self.cache.ajouter(cle, resultat)
+            return list(resultat[0]), dict(resultat[1], depuis_cache=False)
+        return list(resultat[0]), dict(resultat[1], depuis_cache=True)
+
+    def _resoudre_tournee(self, produits, positions, solveur):
+        statistiques = {"solveur": solveur, "nb_produits": 0, "longueur": 0.0, "duree_ms": 0.0}
         if not produits or not positions:
-            return []
+            return [], statistiques
+        debut = time.perf_counter()
 
-        chemin = []
-        produits_restants = list(produits)
-        position_courante = self.point_depart
+        noms, groupes, debuts, cases, distances, couts, accessibles = self._preparer_probleme(produits, positions)
+        fin = self.point_arrivee is not None
+        solveur = choisir_solveur(solveur, len(accessibles) - 1 - fin)
+        tournee, _, cases_choisies, longueur = self._resoudre_affine(solveur, groupes, debuts, cases, distances, couts, accessibles)
+        ordre = [accessibles[i] for i in tournee]
+        chemin = [(noms[i - 1], case) for i, case in zip(ordre, cases_choisies[1:])]
 
-        while produits_restants:
-            produit_plus_proche = None
-            distance_min = float('inf')
+        statistiques.update({
+            "solveur": solveur,
+            "nb_produits": len(chemin),
+            "longueur": longueur,
+            "duree_ms": (time.perf_counter() - debut) * 1000,
+        })
+        return chemin, statistiques
 
-            for produit in produits_restants:
-                for coord, nom in positions.items():
-                    if nom == produit:
-                        x, y = map(int, coord.split(','))
-                        pos = (x, y)
-                        distance = self.calculer_distance(position_courante, pos)
+    # Matrice des couts entre le départ (noeud 0), les produits accessibles
+    # et l'arrivée éventuelle (dernier noeud)
+    def _preparer_probleme(self, produits, positions):
+        # cases de chaque produit demandé, lues dans l'index
+        noms = [p for p in dict.fromkeys(produits) if positions.get(p)]
+        groupes = [[self.point_depart]] + [positions[p] for p in noms]
+        if self.point_arrivee is not None:
+            groupes.append([self.point_arrivee])
+        cases = [case for groupe in groupes for case in groupe]
+        debuts = np.cumsum([0] + [len(groupe) for groupe in groupes[:-1]])
 
-                        if distance < distance_min:
-                            distance_min = distance
-                            produit_plus_proche = produit
-                            position_plus_proche = pos
+        # distance entre produits = meilleure paire de cases
+        distances = self._distances_cases(cases)
+        couts = self._couts_groupes(distances, debuts)
 
-            if produit_plus_proche:
-                chemin.append((produit_plus_proche, position_plus_proche))
-                position_courante = position_plus_proche
-                produits_restants.remove(produit_plus_proche)
+        # produits inaccessibles depuis le départ écartés
+        accessibles = [0] + [i for i in range(1, len(noms) + 1) if couts[0, i] < np.inf]
+        if self.point_arrivee is not None:
+            accessibles.append(len(groupes) - 1)
+        couts = couts[np.ix_(accessibles, accessibles)]
+        return noms, groupes, debuts, cases, distances, couts, accessibles
 
-        return chemin
+    # Couts entre groupes de cases (meilleure paire), restreints aux groupes donnés
+    def _couts_groupes(self, distances, debuts, accessibles=None):
+        if len(debuts) == len(distances):
+            couts = distances
+        else:
+            couts = np.minimum.reduceat(np.minimum.reduceat(distances, debuts, axis=0), debuts, axis=1)
+        return couts if accessibles is None else couts[np.ix_(accessibles, accessibles)]
+
+    # Rend exactes les distances des tronçons d'un chemin (indices consécutifs dans distances) ;
+    # vrai si l'une d'elles dépassait son minorant
+    def _exactifier(self, distances, cases, lignes):
+        if self.matrice is None:
+            return False
+        change = False
+        for a, b in zip(lignes, lignes[1:]):
+            exacte = self.calculer_distance(cases[a], cases[b])
+            if exacte != distances[a, b]:
+                distances[a, b] = distances[b, a] = exacte
+                change = True
+        return change
+
+    # Rend exacts les couts entre les paires de groupes données (meilleure paire de cases) : la paire
+    # la plus proche est calculée jusqu'à ce que la plus proche soit une distance exacte
+    def _exactifier_groupes(self, distances, cases, groupes, debuts, paires):
+        change = False
+        for a, b in paires:
+            if len(groupes[a]) == len(groupes[b]) == 1:
+                change = self._exactifier(distances, cases, [debuts[a], debuts[b]]) or change
+                continue
+            lignes = debuts[a] + np.arange(len(groupes[a]))
+            colonnes = debuts[b] + np.arange(len(groupes[b]))
+            while True:
+                i, j = np.unravel_index(np.argmin(distances[np.ix_(lignes, colonnes)]), (len(lignes), len(colonnes)))
+                if not self._exactifier(distances, cases, [lignes[i], colonnes[j]]):
+                    break
+                change = True
+        return change
+
+    # Résout la tournée sur des distances minorées (Manhattan) tant qu'elles n'ont pas servi :
+    # les tronçons du chemin retenu sont calculés exactement (A*), et le problème résolu à nouveau
+    # s'ils étaient plus longs que prévu ; seules les paires utiles sont ainsi cherchées
+    # retourne la tournée (noeuds de couts), les couts mis à jour, les cases choisies et la longueur
+    def _resoudre_affine(self, solveur, groupes, debuts, cases, distances, couts, accessibles):
+        fin = self.point_arrivee is not None
+        arrivee = [len(groupes) - 1] if fin else []
+        # le solveur exact ne se relance pas : tous ses couts sont exacts d'emblée (listes courtes)
+        if solveur == "held_karp":
+            if self._exactifier_groupes(distances, cases, groupes, debuts, itertools.combinations(accessibles, 2)):
+                couts = self._couts_groupes(distances, debuts, accessibles)
+        meilleure, tournee = None, None
+        for _ in range(MAX_AFFINAGES):
+            if tournee is None:
+                tournee = SOLVEURS[solveur](couts, fin)
+            noeuds = [0] + [accessibles[i] for i in tournee] + arrivee
+            change_groupes = self._exactifier_groupes(distances, cases, groupes, debuts, zip(noeuds, noeuds[1:]))
+            cases_choisies, _, lignes = self._choisir_cases(noeuds, groupes, debuts, distances)
+            change_cases = self._exactifier(distances, cases, lignes)
+            # tronçons exacts : la longueur est celle du chemin réel, la meilleure tournée est gardée
+            longueur = float(distances[lignes[:-1], lignes[1:]].sum())
+            if meilleure is None or longueur < meilleure[2]:
+                meilleure = (tournee, cases_choisies, longueur)
+            if change_groupes:
+                # couts entre produits changés : nouvelle résolution, sinon seul le choix des cases est refait
+                couts = self._couts_groupes(distances, debuts, accessibles)
+                tournee = None
+            elif not change_cases:
+                break
+        tournee, cases_choisies, longueur = meilleure
+        return tournee, couts, cases_choisies, longueur
+
+    # Répartit une liste entre plusieurs préparateurs partant tous du point de départ,
+    # en minimisant le plus long des parcours ; retourne (chemins, statistiques)
+    def repartir_preparateurs(self, produits, positions, nb_preparateurs, solveur="auto"):
+        debut = time.perf_counter()
+        if nb_preparateurs <= 1:
+            chemin, statistiques = self.calculer_tournee(produits, positions, solveur)
+            longueurs = [statistiques["longueur"]]
+            return [chemin], {"nb_preparateurs": 1, "longueurs": longueurs, "longueur_max": longueurs[0],
+                              "duree_ms": (time.perf_counter() - debut) * 1000}
+        if not produits or not positions:
+            return [[] for _ in range(nb_preparateurs)], {"nb_preparateurs": nb_preparateurs, "longueurs": [0.0] * nb_preparateurs,
+                                                          "longueur_max": 0.0, "duree_ms": 0.0}
+
+        noms, groupes, debuts, cases, distances, couts, accessibles = self._preparer_probleme(produits, positions)
+        fin = self.point_arrivee is not None
+        arrivee = [len(couts) - 1] if fin else []
+
+        # une grande tournée, découpée en segments consécutifs
+        tournee, couts, _, _ = self._resoudre_affine(choisir_solveur(solveur, len(couts) - 1 - fin),
+                                                     groupes, debuts, cases, distances, couts, accessibles)
+        segments = decouper_tournee(couts, tournee, nb_preparateurs, fin)
+
+        # chaque segment est réoptimisé seul, en parallèle pour les grandes listes (s'il y a plusieurs processeurs)
+        sous_problemes = [(couts[np.ix_([0] + segment + arrivee, [0] + segment + arrivee)],
+                           choisir_solveur(solveur, len(segment)), fin)
+                          for segment in segments]
+        if len(tournee) >= SEUIL_PARALLELE and (os.cpu_count() or 1) > 1:
+            ordres = list(_pool_processus().map(_resoudre_sous_probleme, sous_problemes))
+        else:
+            ordres = [_resoudre_sous_probleme(sous_probleme) for sous_probleme in sous_problemes]
+
+        chemins, longueurs = [], []
+        for segment, ordre, (sous_couts, _, _) in zip(segments, ordres, sous_problemes):
+            # on garde l'ordre du découpage si la réoptimisation ne fait pas mieux
+            if longueur_tournee(sous_couts, ordre, fin) > longueur_tournee(sous_couts, range(1, len(segment) + 1), fin):
+                ordre = list(range(1, len(segment) + 1))
+            noeuds = [accessibles[segment[i - 1]] for i in ordre]
+            fin_segment = [accessibles[-1]] if fin else []
+            cases_choisies, _, lignes = self._choisir_cases([0] + noeuds + fin_segment, groupes, debuts, distances)
+            self._exactifier(distances, cases, lignes)
+            chemins.append([(noms[i - 1], case) for i, case in zip(noeuds, cases_choisies[1:])])
+            longueurs.append(float(distances[lignes[:-1], lignes[1:]].sum()))
+
+        chemins += [[] for _ in range(nb_preparateurs - len(chemins))]
+        longueurs += [0.0] * (nb_preparateurs - len(longueurs))
+        return chemins, {"nb_preparateurs": nb_preparateurs, "longueurs": longueurs, "longueur_max": max(longueurs),
+                         "duree_ms": (time.perf_counter() - debut) * 1000}
+
+    # Pour un ordre fixé, choisit la case de chaque produit (programmation dynamique)
+    # retourne les cases, la longueur obtenue et les indices des cases dans distances
+    def _choisir_cases(self, ordre, groupes, debuts, distances):
+        if all(len(groupes[i]) == 1 for i in ordre):
+            lignes = debuts[ordre]
+            return [groupes[i][0] for i in ordre], float(distances[lignes[:-1], lignes[1:]].sum()), lignes
+
+        colonnes = [debuts[i] + np.arange(len(groupes[i])) for i in ordre]
+        cout = np.zeros(1)
+        retours = []
+        for precedentes, suivantes in zip(colonnes, colonnes[1:]):
+            totaux = cout[:, None] + distances[np.ix_(precedentes, suivantes)]
+            retours.append(np.argmin(totaux, axis=0))
+            cout = totaux.min(axis=0)
+
+        choix = [int(np.argmin(cout))]
+        for retour in reversed(retours):
+            choix.append(int(retour[choix[-1]]))
+        choix.reverse()
+        return [groupes[i][k] for i, k in zip(ordre, choix)], float(cout.min()), [debuts[i] + k for i, k in zip(ordre, choix)]
+
+    # Insère un produit à l'endroit le moins coûteux d'un chemin existant,
+    # puis améliore localement le chemin (nombre de passes borné)
+    def inserer_produit(self, chemin, produit, positions, passes=MAX_PASSES_REPARATION):
+        cases_produit = positions.get(produit)
+        if not cases_produit or any(p == produit for p, _ in chemin):
+            return list(chemin)
+
+        etapes = self.etapes(chemin)
+        cases = etapes + cases_produit
+        distances = self._distances_cases(cases)
+        n = len(etapes)
+        self._exactifier(distances, cases, list(range(n)))
+
+        # surcoût d'insertion de chaque case après chaque étape (ou en fin de chemin)
+        # jamais après l'arrivée ; surcoûts minorés tant que leurs tronçons ne sont pas calculés :
+        # la meilleure insertion est recalculée exactement jusqu'à ce qu'elle reste la meilleure
+        while True:
+            surcouts = distances[:n, n:].copy()
+            surcouts[:-1] += distances[n:, 1:n].T - distances[np.arange(n - 1), np.arange(1, n)][:, None]
+            if self.point_arrivee is not None:
+                surcouts = surcouts[:-1]
+            if not np.isfinite(surcouts).any():
+                return list(chemin)
+            apres, case = np.unravel_index(np.argmin(surcouts), surcouts.shape)
+            if not self._exactifier(distances, cases, [apres, n + case] + ([apres + 1] if apres < n - 1 else [])):
+                break
+
+        nouveau = list(chemin)
+        nouveau.insert(apres, (produit, cases_produit[case]))
+        return self.ameliorer_chemin(nouveau, passes)
+
+    # Retire un produit du chemin en reliant ses voisins, puis amélioration locale
+    def retirer_produit(self, chemin, produit, passes=MAX_PASSES_REPARATION):
+        nouveau = [(p, position) for p, position in chemin if p != produit]
+        if len(nouveau) == len(chemin):
+            return list(chemin)
+        return self.ameliorer_chemin(nouveau, passes)
+
+    # Quelques passes 2-opt / Or-opt sur un chemin existant (cases conservées)
+    def ameliorer_chemin(self, chemin, passes=MAX_PASSES_REPARATION):
+        debut = time.perf_counter()
+        fin = self.point_arrivee is not None
+        etapes = self.etapes(chemin)
+        couts = self._distances_cases(etapes)
+        tournee = np.arange(len(couts))
+        for _ in range(MAX_AFFINAGES):
+            if len(chemin) > 2:
+                voisins = plus_proches_voisins(couts, NB_VOISINS)
+                tournee = recherche_locale(couts, tournee, voisins, fin, passes)
+            if not self._exactifier(couts, etapes, list(tournee)):
+                break
+
+        ordre = tournee[1:len(tournee) - fin]
+        nouveau = [chemin[i - 1] for i in ordre]
+        self.statistiques = {
+            "solveur": "reparation",
+            "nb_produits": len(nouveau),
+            "longueur": longueur_tournee(couts, ordre, fin),
+            "duree_ms": (time.perf_counter() - debut) * 1000,
+            "depuis_cache": False,
+        }
+        return nouveau
+
+    # Longueur de marche d'un chemin depuis le point de départ (jusqu'à l'arrivée)
+    def longueur_chemin(self, chemin):
+        cases = self.etapes(chemin)
+        if self.grille is not None:
+            return float(sum(self.calculer_distance(a, b) for a, b in zip(cases, cases[1:])))
+        x, y = np.array(cases, dtype=np.float64).T
+        return float(np.hypot(np.diff(x), np.diff(y)).sum())
+
+    # Trajet réel case par case : départ, chaque étape du chemin puis arrivée
+    # (tronçons repris de la matrice, qui vient de les chercher pour le calcul du chemin)
+    def calculer_trajet(self, chemin):
+        if self.matrice is None or not chemin:
+            return []
+        etapes = self.etapes(chemin)
+        trajet = etapes[:1]
+        for position in etapes[1:]:
+            troncon = self.matrice.trajet(trajet[-1], position)
+            trajet.extend(troncon[1:])
+        return trajet
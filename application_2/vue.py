@@ -1,7 +1,190 @@
 import sys, os
 from PyQt6.QtWidgets import *
-from PyQt6.QtGui import QPen, QPixmap, QColor, QBrush, QFont, QPainter, QAction, QPainterPath
-from PyQt6.QtCore import Qt, QPointF, pyqtSignal
+from PyQt6.QtGui import QPen, QPixmap, QColor, QBrush, QFont, QFontMetricsF, QPainter, QAction, QPolygonF, QStaticText, QTransform
+from PyQt6.QtCore import Qt, QPointF, QRectF, QLineF, QTimer, pyqtSignal
+
+# modules communs aux deux applications (dossier commun/ à la racine du dépôt)
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RACINE not in sys.path:
+    sys.path.insert(0, RACINE)
+from commun.tuiles import charger_image_plan, creer_item_plan
+
+# couleur du chemin de chaque préparateur
+COULEURS_PREPARATEURS = [QColor(0, 0, 255), QColor(230, 120, 0), QColor(150, 0, 200), QColor(0, 150, 150),
+                         QColor(200, 0, 100), QColor(100, 100, 0), QColor(0, 100, 200), QColor(120, 60, 0)]
+
+# niveau de détail, en pixels à l'écran : hauteur de texte sous laquelle les noms
+# sont illisibles, taille de case sous laquelle ils se chevauchent, et sous laquelle
+# les marqueurs sont remplacés par la vue d'ensemble
+TAILLE_MIN_ETIQUETTE = 6
+TAILLE_MIN_CASE_ETIQUETTE = 12
+TAILLE_MIN_CASE_MARQUEUR = 10
+
+# conteneur sans dessin : masquer le calque masque tous ses enfants d'un coup
+class Calque(QGraphicsItem):
+    def __init__(self):
+        super().__init__()
+        self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemHasNoContents)
+    
+    def boundingRect(self):
+        return QRectF()
+    
+    def paint(self, painter, option, widget=None):
+        pass
+
+# grille du plan en un seul item mis en cache : redessinée seulement au zoom
+# ou quand la grille change
+class Quadrillage(QGraphicsItem):
+    def __init__(self):
+        super().__init__()
+        self.crayon = QPen(QColor(255, 0, 0))
+        self.crayon.setWidth(1)
+        self.rect, self.lignes = QRectF(), []
+        self.setAcceptedMouseButtons(Qt.MouseButton.NoButton)
+        self.setCacheMode(QGraphicsItem.CacheMode.DeviceCoordinateCache)
+        self.setZValue(-0.5)
+    
+    def redimensionner(self, largeur_image, hauteur_image, nb_rangs, nb_rayons):
+        self.prepareGeometryChange()
+        self.rect = QRectF(0, 0, largeur_image, hauteur_image)
+        hauteur_case, largeur_case = hauteur_image / nb_rangs, largeur_image / nb_rayons
+        self.lignes = [QLineF(0, rang * hauteur_case, largeur_image, rang * hauteur_case) for rang in range(nb_rangs + 1)]
+        self.lignes += [QLineF(rayon * largeur_case, 0, rayon * largeur_case, hauteur_image) for rayon in range(nb_rayons + 1)]
+        self.update()
+    
+    def boundingRect(self):
+        return self.rect.adjusted(-1, -1, 1, 1)
+    
+    def paint(self, painter, option, widget=None):
+        painter.setPen(self.crayon)
+        painter.drawLines(self.lignes)
+
+# vue d'ensemble des produits aux faibles zooms : toutes les cases occupées
+# peintes d'un seul appel, en un item mis en cache
+class ApercuProduits(QGraphicsItem):
+    def __init__(self):
+        super().__init__()
+        self.rect, self.cases, self.surlignees = QRectF(), [], []
+        self.setAcceptedMouseButtons(Qt.MouseButton.NoButton)
+        self.setCacheMode(QGraphicsItem.CacheMode.DeviceCoordinateCache)
+    
+    def definir_cases(self, cases, largeur_image, hauteur_image, nb_rangs, nb_rayons):
+        self.prepareGeometryChange()
+        self.rect = QRectF(0, 0, largeur_image, hauteur_image)
+        self.largeur_case, self.hauteur_case = largeur_image / nb_rayons, hauteur_image / nb_rangs
+        self.cases = [self.rect_case(case) for case in cases]
+        self.update()
+    
+    def surligner(self, cases):
+        self.surlignees = [self.rect_case(case) for case in cases]
+        self.update()
+    
+    def rect_case(self, case):
+        x, y = case
+        return QRectF(x * self.largeur_case, y * self.hauteur_case, self.largeur_case, self.hauteur_case)
+    
+    def boundingRect(self):
+        return self.rect
+    
+    def paint(self, painter, option, widget=None):
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(QColor(0, 200, 0, 150))
+        painter.drawRects(self.cases)
+        painter.setBrush(QColor(255, 0, 0, 200))
+        painter.drawRects(self.surlignees)
+
+# au-delà de ce nombre d'étapes, un chemin est dévoilé progressivement
+SEUIL_REVELATION = 50
+ETAPES_PAR_IMAGE = 10
+
+# Tous les chemins affichés en un seul item : tracé, disques et numéros des étapes
+# peints d'un seul appel, numéros mis en cache (QStaticText)
+class CalqueChemin(QGraphicsObject):
+    def __init__(self):
+        super().__init__()
+        self.traces, self.rect = [], QRectF()
+        self.nb_visibles, self.nb_etapes = 0, 0
+        self.numeros = {}
+        self.police = QFont("Arial", 10, QFont.Weight.Bold)
+        self.setZValue(1)
+        self.setAcceptedMouseButtons(Qt.MouseButton.NoButton)
+        self.setCacheMode(QGraphicsItem.CacheMode.DeviceCoordinateCache)
+        self.minuteur = QTimer(self)
+        self.minuteur.setInterval(16)
+        self.minuteur.timeout.connect(self.reveler)
+    
+    # traces : liste de dictionnaires (points du tracé, centres des étapes,
+    # indice du tracé atteint à chaque étape, rayon, couleur)
+    def definir_traces(self, traces):
+        self.prepareGeometryChange()
+        self.traces = traces
+        self.rect = QRectF()
+        for trace in traces:
+            marge = trace['rayon'] + 2
+            self.rect = self.rect.united(trace['points'].boundingRect().adjusted(-marge, -marge, marge, marge))
+        
+        # long chemin : dévoilé quelques étapes par image
+        self.nb_etapes = max((len(trace['centres']) for trace in traces), default=0)
+        if self.nb_etapes > SEUIL_REVELATION:
+            self.nb_visibles = 0
+            self.minuteur.start()
+        else:
+            self.nb_visibles = self.nb_etapes
+            self.minuteur.stop()
+        self.update()
+    
+    def vider(self):
+        self.definir_traces([])
+    
+    def reveler(self):
+        self.nb_visibles = min(self.nb_visibles + ETAPES_PAR_IMAGE, self.nb_etapes)
+        if self.nb_visibles >= self.nb_etapes: self.minuteur.stop()
+        self.update()
+    
+    def numero(self, i):
+        texte = self.numeros.get(i)
+        if texte is None:
+            texte = QStaticText(str(i))
+            texte.setTextFormat(Qt.TextFormat.PlainText)
+            texte.prepare(QTransform(), self.police)
+            self.numeros[i] = texte
+        return texte
+    
+    def boundingRect(self):
+        return self.rect
+    
+    def paint(self, painter, option, widget=None):
+        painter.setFont(self.police)
+        for trace in self.traces:
+            n = min(self.nb_visibles, len(trace['centres']))
+            
+            # tracé complet une fois toutes les étapes dévoilées, sinon jusqu'à la dernière dévoilée
+            if n == len(trace['centres']):
+                fin = trace['points'].size()
+            else:
+                fin = trace['indices'][n - 1] + 1 if n else 1
+            crayon = QPen(trace['couleur'])
+            crayon.setWidth(3)
+            crayon.setStyle(Qt.PenStyle.DashLine)
+            painter.setPen(crayon)
+            painter.setBrush(Qt.BrushStyle.NoBrush)
+            painter.drawPolyline(trace['points'].mid(0, fin))
+            
+            # disques des étapes
+            fond = QColor(trace['couleur'])
+            fond.setAlpha(150)
+            painter.setPen(QPen(trace['couleur'].darker(170)))
+            painter.setBrush(QBrush(fond))
+            rayon = trace['rayon']
+            for centre in trace['centres'][:n]:
+                painter.drawEllipse(centre, rayon, rayon)
+            
+            # numéros
+            painter.setPen(QColor(255, 255, 255))
+            for i, centre in enumerate(trace['centres'][:n]):
+                texte = self.numero(i + 1)
+                taille = texte.size()
+                painter.drawStaticText(QPointF(centre.x() - taille.width() / 2, centre.y() - taille.height() / 2), texte)
 
 class Scene(QGraphicsScene):
     
@@ -10,82 +193,95 @@ class Scene(QGraphicsScene):
     def __init__(self):
         super().__init__()
         self.nb_rangs, self.nb_rayons = 24, 47
-        self.marqueurs, self.coordonnees_produits, self.lignes_chemin = {}, {}, []
+        self.marqueurs = {}
+        self.grille_placements = None  # placements du projet (GrillePlacements du modèle)
+        self.produit_surligne = None
+        self.geometrie_marqueurs = None
+        
+        # marqueurs et noms regroupés dans des calques masqués selon le zoom
+        self.echelle = 1.0
+        self.police_etiquettes = QFont("Arial", 8)
+        self.hauteur_etiquette = QFontMetricsF(self.police_etiquettes).height()
+        self.apercu = ApercuProduits()
+        self.calque_marqueurs, self.calque_etiquettes = Calque(), Calque()
+        self.calque_chemin = CalqueChemin()
+        for calque in (self.apercu, self.calque_marqueurs, self.calque_etiquettes, self.calque_chemin): self.addItem(calque)
         self.plan, self.image = None, None
+        self.quadrillage = None
         self.etiquette_produit, self.fond_etiquette = None, None
-        self.point_depart = (28, 21)  # Point de départ mis à jour
+        self.case_survolee = -1
+        self.creer_etiquette()
+        self.point_depart = None  # entrée du projet ouvert, donnée par le contrôleur
+        self.point_arrivee = None
         self.point_depart_marker = None
+        self.marqueurs_points = []
+    
+    # étiquette de survol : créée une seule fois, cachée hors des produits
+    def creer_etiquette(self):
+        self.fond_etiquette = QGraphicsRectItem()
+        self.fond_etiquette.setBrush(QBrush(QColor(0, 0, 0, 180)))
+        self.fond_etiquette.setPen(QPen(Qt.PenStyle.NoPen))
+        self.fond_etiquette.setZValue(10)
+        self.fond_etiquette.setAcceptedMouseButtons(Qt.MouseButton.NoButton)
+        self.fond_etiquette.hide()
+        
+        # le texte est enfant du fond : les deux bougent ensemble
+        self.etiquette_produit = QGraphicsSimpleTextItem(self.fond_etiquette)
+        self.etiquette_produit.setFont(QFont("Arial", 14, QFont.Weight.Bold))
+        self.etiquette_produit.setBrush(QBrush(QColor(255, 255, 255)))
+        self.etiquette_produit.setPos(4, 4)
+        self.addItem(self.fond_etiquette)
     
     # mouvement de la souris
+    # l'étiquette n'est re-textée que quand le curseur change de case
     def mouseMoveEvent(self, event):
         super().mouseMoveEvent(event)
         if not self.plan: return
         
         pos = event.scenePos()
-        largeur_image, hauteur_image = self.plan.width(), self.plan.height()
-        hauteur_case, largeur_case = hauteur_image / self.nb_rangs, largeur_image / self.nb_rayons
-        x, y = int(pos.x() / largeur_case), int(pos.y() / hauteur_case)
-        coord = f"{x},{y}"
-        
-        # Supprimer la derniere étiquette si elle existe
-        if self.etiquette_produit:
-            self.removeItem(self.etiquette_produit)
-            self.etiquette_produit = None
-        if self.fond_etiquette:
-            self.removeItem(self.fond_etiquette)
-            self.fond_etiquette = None
-        
-        if coord in self.coordonnees_produits:
-            produit = self.coordonnees_produits[coord]
+        x = int(pos.x() * self.nb_rayons / self.plan.width())
+        y = int(pos.y() * self.nb_rangs / self.plan.height())
+        dans_plan = pos.x() >= 0 and pos.y() >= 0 and x < self.nb_rayons and y < self.nb_rangs
+        case = y * self.nb_rayons + x if dans_plan else -1
+        
+        if case != self.case_survolee:
+            self.case_survolee = case
+            produit = self.grille_placements.produit(x, y) if dans_plan and self.grille_placements is not None else None
+            if produit is None:
+                self.fond_etiquette.hide()
+                self.produit_sous_curseur.emit("Aucun produit", pos)
+                return
             
-            # Créer l'étiquette avec nom du produit
-            self.etiquette_produit = QGraphicsTextItem(f"{produit}")
-            self.etiquette_produit.setFont(QFont("Arial", 14, QFont.Weight.Bold))
-            self.etiquette_produit.setDefaultTextColor(QColor(255, 255, 255))
+            # Nouveau nom de produit et fond à sa taille
+            self.etiquette_produit.setText(produit)
+            self.fond_etiquette.setRect(self.etiquette_produit.boundingRect().adjusted(0, 0, 8, 8))
+            self.fond_etiquette.show()
             
-            # Créer un fond pour l'étiquette
-            rect = self.etiquette_produit.boundingRect()
-            self.fond_etiquette = QGraphicsRectItem(rect)
-            self.fond_etiquette.setBrush(QBrush(QColor(0, 0, 0, 180)))
-            self.fond_etiquette.setPen(QPen(Qt.PenStyle.NoPen))
+            # Émettre le signal avec les coordonnées
+            self.produit_sous_curseur.emit(f"{produit} ({x},{y})", pos)
+        
+        if self.fond_etiquette.isVisible():
+            rect = self.fond_etiquette.rect()
             
             # Positionner l'étiquette à côté du curseur (légèrement décalée)
-            offset_x = 15
-            offset_y = -rect.height() - 10  
-            
-            # S'assurer que l'étiquette reste dans les limites de la scène
+            # en restant dans les limites de la scène
             scene_rect = self.sceneRect()
-            etiquette_x = pos.x() + offset_x
-            etiquette_y = pos.y() + offset_y
-            
-            # Ajuster si l'étiquette sort de la scène à droite
+            etiquette_x = pos.x() + 15
+            etiquette_y = pos.y() - rect.height() - 10
             if etiquette_x + rect.width() > scene_rect.right():
                 etiquette_x = pos.x() - rect.width() - 15
-            
-            # Ajuster si l'étiquette sort de la scène en haut
             if etiquette_y < scene_rect.top():
                 etiquette_y = pos.y() + 15
-            
-            # Positionner l'étiquette et son fond
-            self.etiquette_produit.setPos(etiquette_x, etiquette_y)
             self.fond_etiquette.setPos(etiquette_x, etiquette_y)
-            
-            # Ajouter l'étiquette à la scène
-            self.addItem(self.fond_etiquette)
-            self.addItem(self.etiquette_produit)
-            
-            # Émettre le signal avec les coordonnées
-            self.produit_sous_curseur.emit(f"{produit} ({x},{y})", pos)
-        else:
-            self.produit_sous_curseur.emit("Aucun produit", pos)
     
-    # charger le plan du magasin
+    # charger le plan du magasin (découpé en tuiles s'il est très grand)
     def charger_plan(self, chemin_image=None):
         if chemin_image is None: chemin_image = sys.path[0] + "/plan.jpg"
         if os.path.exists(chemin_image):
             if self.image: self.removeItem(self.image)
-            self.plan = QPixmap(chemin_image)
-            self.image = QGraphicsPixmapItem(self.plan)
+            self.plan = charger_image_plan(chemin_image)
+            self.image = creer_item_plan(self.plan)
+            self.image.setZValue(-1)
             self.addItem(self.image)
             self.setSceneRect(0, 0, self.plan.width(), self.plan.height())
             self.creer_quadrillage()
@@ -93,169 +289,219 @@ class Scene(QGraphicsScene):
             return True
         return False
     
-    # marquer le point de départ
+    # points de départ et d'arrivée du projet (arrivée optionnelle)
+    def definir_points(self, point_depart, point_arrivee=None):
+        self.point_depart = tuple(point_depart)
+        self.point_arrivee = tuple(point_arrivee) if point_arrivee is not None else None
+        self.marquer_point_depart()
+    
+    # marquer le point de départ (et la caisse s'il y en a une)
     def marquer_point_depart(self):
-        if not self.plan: return
+        for item in self.marqueurs_points: self.removeItem(item)
+        self.marqueurs_points.clear()
+        if not self.plan or self.point_depart is None: return
         
+        self.point_depart_marker = self.marquer_point(self.point_depart, "ENTRÉE", QColor(255, 0, 0))
+        if self.point_arrivee is not None:
+            self.marquer_point(self.point_arrivee, "CAISSE", QColor(0, 130, 0))
+    
+    def marquer_point(self, point, libelle, couleur):
         largeur_image, hauteur_image = self.plan.width(), self.plan.height()
         largeur_case = largeur_image / self.nb_rayons
         hauteur_case = hauteur_image / self.nb_rangs
         
-        x, y = self.point_depart
+        x, y = point
         centre_x = (x + 0.5) * largeur_case
         centre_y = (y + 0.5) * hauteur_case
         
-        # Créer un cercle pour marquer le point de départ
+        # Créer un cercle pour marquer le point
         rayon = min(largeur_case, hauteur_case) * 0.4
-        self.point_depart_marker = QGraphicsEllipseItem(
+        marqueur = QGraphicsEllipseItem(
             centre_x - rayon, centre_y - rayon, 
             rayon * 2, rayon * 2
         )
-        self.point_depart_marker.setBrush(QBrush(QColor(255, 0, 0, 150)))
-        self.point_depart_marker.setPen(QPen(QColor(255, 0, 0), 3))
-        self.addItem(self.point_depart_marker)
-        
-        # Ajouter un texte "ENTRÉE"
-        texte_depart = QGraphicsTextItem("ENTRÉE")
-        texte_depart.setDefaultTextColor(QColor(255, 0, 0))
-        font = texte_depart.font()
+        fond = QColor(couleur)
+        fond.setAlpha(150)
+        marqueur.setBrush(QBrush(fond))
+        marqueur.setPen(QPen(couleur, 3))
+        self.addItem(marqueur)
+        
+        # Ajouter le texte ("ENTRÉE", "CAISSE")
+        texte = QGraphicsTextItem(libelle)
+        texte.setDefaultTextColor(couleur)
+        font = texte.font()
         font.setBold(True)
-        texte_depart.setFont(font)
-        texte_depart.setPos(centre_x - texte_depart.boundingRect().width() / 2, 
-                           centre_y - rayon - texte_depart.boundingRect().height())
-        self.addItem(texte_depart)
+        texte.setFont(font)
+        texte.setPos(centre_x - texte.boundingRect().width() / 2, 
+                     centre_y - rayon - texte.boundingRect().height())
+        self.addItem(texte)
+        self.marqueurs_points += [marqueur, texte]
+        return marqueur
     
     # créer le quadrillage du plan
     def creer_quadrillage(self):
         if not self.plan: return
-        for item in self.items():
-            if isinstance(item, QGraphicsLineItem): self.removeItem(item)
-        
-        largeur_image, hauteur_image = self.plan.width(), self.plan.height()
-        hauteur_case, largeur_case = hauteur_image / self.nb_rangs, largeur_image / self.nb_rayons
-        crayon_rouge = QPen(QColor(255, 0, 0))
-        crayon_rouge.setWidth(1)
-        
-        for rang in range(self.nb_rangs + 1):
-            ligne = QGraphicsLineItem(0, rang * hauteur_case, largeur_image, rang * hauteur_case)
-            ligne.setPen(crayon_rouge)
-            self.addItem(ligne)
-        
-        for rayon in range(self.nb_rayons + 1):
-            ligne = QGraphicsLineItem(rayon * largeur_case, 0, rayon * largeur_case, hauteur_image)
-            ligne.setPen(crayon_rouge)
-            self.addItem(ligne)
+        if self.quadrillage is None:
+            self.quadrillage = Quadrillage()
+            self.addItem(self.quadrillage)
+        self.quadrillage.redimensionner(self.plan.width(), self.plan.height(), self.nb_rangs, self.nb_rayons)
     
     # Permet d'afficher les emplacements des produits
-    def afficher_emplacements(self, placements, nb_rangs=None, nb_rayons=None):
-        if nb_rangs is not None: self.nb_rangs = nb_rangs
-        if nb_rayons is not None: self.nb_rayons = nb_rayons
-        
-        for marqueur in self.marqueurs.values():
+    # les marqueurs sont indexés par case : seuls ceux ajoutés, retirés ou renommés
+    # (ou tous si la grille change) touchent la scène
+    # les placements sont lus dans la grille du modèle (GrillePlacements), gardée pour le survol et le surlignage
+    def afficher_emplacements(self, grille_placements):
+        self.nb_rangs, self.nb_rayons = grille_placements.nb_rangs, grille_placements.nb_rayons
+        
+        # le surlignage est retiré avec les anciennes positions puis reposé sur les nouvelles
+        self.styler_produit(self.produit_surligne, False)
+        self.grille_placements = grille_placements
+        cases = {}
+        if self.plan:
+            occupees = grille_placements.cases_occupees()
+            ids = grille_placements.grille[occupees[:, 1], occupees[:, 0]].tolist()
+            cases = {(x, y): grille_placements.noms[i] for (x, y), i in zip(occupees.tolist(), ids)}
+        
+        # marqueurs des cases vidées
+        for case in [case for case in self.marqueurs if case not in cases]:
+            marqueur = self.marqueurs.pop(case)
             self.removeItem(marqueur['cercle'])
             self.removeItem(marqueur['texte'])
-        self.marqueurs.clear()
-        self.coordonnees_produits.clear()
-        
-        if not self.plan: return
         
+        # grille changée : tous les marqueurs restants sont replacés
+        geometrie = (self.plan.width(), self.plan.height(), self.nb_rangs, self.nb_rayons) if self.plan else None
+        replacer = geometrie != self.geometrie_marqueurs
+        self.geometrie_marqueurs = geometrie
+        
+        for case, produit in cases.items():
+            marqueur = self.marqueurs.get(case)
+            if marqueur is None:
+                self.marqueurs[case] = self.creer_marqueur(case, produit)
+            elif marqueur['produit'] != produit:
+                marqueur['produit'] = produit
+                marqueur['texte'].setPlainText(produit)
+                self.placer_marqueur(marqueur, case)
+            elif replacer:
+                self.placer_marqueur(marqueur, case)
+        
+        self.case_survolee = None
+        if self.plan:
+            self.apercu.definir_cases(cases, self.plan.width(), self.plan.height(), self.nb_rangs, self.nb_rayons)
+        if self.produit_surligne is not None:
+            self.mettre_en_evidence_produit(self.produit_surligne)
+        self.definir_echelle(self.echelle)
+    
+    def creer_marqueur(self, case, produit):
+        cercle = QGraphicsEllipseItem(self.calque_marqueurs)
+        cercle.setBrush(QBrush(QColor(0, 200, 0, 150)))
+        cercle.setPen(QPen(QColor(0, 100, 0)))
+        
+        texte = QGraphicsTextItem(produit, self.calque_etiquettes)
+        texte.setFont(self.police_etiquettes)
+        texte.setDefaultTextColor(QColor(0, 0, 0))
+        
+        marqueur = {'cercle': cercle, 'texte': texte, 'produit': produit}
+        self.placer_marqueur(marqueur, case)
+        return marqueur
+    
+    # niveau de détail selon le zoom de la vue : noms affichés seulement s'ils sont lisibles,
+    # vue d'ensemble à la place des marqueurs quand les cases sont minuscules
+    def definir_echelle(self, echelle):
+        self.echelle = echelle
+        taille_case = 0
+        if self.plan:
+            taille_case = min(self.plan.width() / self.nb_rayons, self.plan.height() / self.nb_rangs) * echelle
+        details = taille_case >= TAILLE_MIN_CASE_MARQUEUR
+        self.calque_marqueurs.setVisible(details)
+        self.apercu.setVisible(not details)
+        self.calque_etiquettes.setVisible(details and taille_case >= TAILLE_MIN_CASE_ETIQUETTE
+                                          and self.hauteur_etiquette * echelle >= TAILLE_MIN_ETIQUETTE)
+    
+    # place le cercle et le nom d'un marqueur sur sa case
+    def placer_marqueur(self, marqueur, case):
         largeur_image, hauteur_image = self.plan.width(), self.plan.height()
         hauteur_case, largeur_case = hauteur_image / self.nb_rangs, largeur_image / self.nb_rayons
-        
-        for coord, produit in placements.items():
-            try:
-                x, y = map(int, coord.split(','))
-                centre_x, centre_y = (x + 0.5) * largeur_case, (y + 0.5) * hauteur_case
-                rayon = min(largeur_case, hauteur_case) * 0.3
-                
-                cercle = QGraphicsEllipseItem(centre_x - rayon, centre_y - rayon, rayon * 2, rayon * 2)
-                cercle.setBrush(QBrush(QColor(0, 200, 0, 150)))
-                cercle.setPen(QPen(QColor(0, 100, 0)))
-                self.addItem(cercle)
-                
-                texte = QGraphicsTextItem(produit)
-                texte.setFont(QFont("Arial", 8))
-                texte.setDefaultTextColor(QColor(0, 0, 0))
-                texte.setPos(centre_x - texte.boundingRect().width() / 2, centre_y - rayon - 20)
-                self.addItem(texte)
-                
-                self.marqueurs[coord] = {'cercle': cercle, 'texte': texte, 'produit': produit}
-                self.coordonnees_produits[coord] = produit
-            except Exception as e:
-                print(f"Erreur lors de l'affichage du produit {produit} à {coord}: {str(e)}")
+        x, y = case
+        centre_x, centre_y = (x + 0.5) * largeur_case, (y + 0.5) * hauteur_case
+        rayon = min(largeur_case, hauteur_case) * 0.3
+        marqueur['cercle'].setRect(centre_x - rayon, centre_y - rayon, rayon * 2, rayon * 2)
+        texte = marqueur['texte']
+        texte.setPos(centre_x - texte.boundingRect().width() / 2, centre_y - rayon - 20)
     
     # Permet de mettre en évidence un produit
+    # seuls les marqueurs de l'ancien et du nouveau produit sont restylés,
+    # retrouvés par l'index des placements (produit -> cases) puis marqueurs (case -> marqueur)
     def mettre_en_evidence_produit(self, produit):
-        for marqueur in self.marqueurs.values():
-            marqueur['cercle'].setBrush(QBrush(QColor(0, 200, 0, 150)))
-            marqueur['cercle'].setPen(QPen(QColor(0, 100, 0)))
-        
-        for coord, marqueur in self.marqueurs.items():
-            if marqueur['produit'] == produit:
+        self.apercu.surligner(self.cases_produit(produit))
+        self.styler_produit(self.produit_surligne, False)
+        self.produit_surligne = produit
+        marqueurs = self.styler_produit(produit, True)
+        if not marqueurs:
+            return None
+        cercle = marqueurs[0]['cercle']
+        return QPointF(cercle.rect().center().x() + cercle.pos().x(),
+                       cercle.rect().center().y() + cercle.pos().y())
+    
+    def cases_produit(self, produit):
+        if self.grille_placements is None:
+            return []
+        return [tuple(case) for case in self.grille_placements.cases_produit(produit).tolist()]
+    
+    # style normal ou surligné des marqueurs d'un produit (toutes ses cases)
+    def styler_produit(self, produit, surligne):
+        marqueurs = [self.marqueurs[case] for case in self.cases_produit(produit) if case in self.marqueurs]
+        for marqueur in marqueurs:
+            if surligne:
                 marqueur['cercle'].setBrush(QBrush(QColor(255, 0, 0, 200)))
                 marqueur['cercle'].setPen(QPen(QColor(150, 0, 0), 2))
-                return QPointF(marqueur['cercle'].rect().center().x() + marqueur['cercle'].pos().x(),
-                              marqueur['cercle'].rect().center().y() + marqueur['cercle'].pos().y())
-        return None
+            else:
+                marqueur['cercle'].setBrush(QBrush(QColor(0, 200, 0, 150)))
+                marqueur['cercle'].setPen(QPen(QColor(0, 100, 0)))
+        return marqueurs
     
     # Effacer le chemin
     def effacer_chemin(self):
-        for ligne in self.lignes_chemin: self.removeItem(ligne)
-        self.lignes_chemin.clear()
+        self.calque_chemin.vider()
     
-    # afficher le chemin calculé
-    def afficher_chemin(self, chemin):
-        self.effacer_chemin()
-        if not self.plan or not chemin: return
-        
+    # afficher le chemin calculé (trajet = cases réellement parcourues)
+    def afficher_chemin(self, chemin, trajet=None):
+        if not self.plan or not chemin:
+            self.effacer_chemin()
+            return
+        self.calque_chemin.definir_traces([self.construire_trace(chemin, trajet, COULEURS_PREPARATEURS[0])])
+    
+    # afficher un chemin par préparateur, chacun dans sa couleur
+    def afficher_chemins(self, chemins, trajets=None):
+        if not self.plan:
+            self.effacer_chemin()
+            return
+        trajets = trajets or [None] * len(chemins)
+        self.calque_chemin.definir_traces([
+            self.construire_trace(chemin, trajet, COULEURS_PREPARATEURS[i % len(COULEURS_PREPARATEURS)])
+            for i, (chemin, trajet) in enumerate(zip(chemins, trajets)) if chemin])
+    
+    # Géométrie d'un chemin pour le calque : points du tracé et centre de chaque étape
+    def construire_trace(self, chemin, trajet, couleur):
         largeur_image, hauteur_image = self.plan.width(), self.plan.height()
         hauteur_case, largeur_case = hauteur_image / self.nb_rangs, largeur_image / self.nb_rayons
         
-        # Créer le chemin
-        path = QPainterPath()
-        
-        # Point de départ
-        x_depart, y_depart = self.point_depart
-        depart_x = (x_depart + 0.5) * largeur_case
-        depart_y = (y_depart + 0.5) * hauteur_case
-        path.moveTo(depart_x, depart_y)
-        
-        # Ajouter les points du chemin
-        for _, (x, y) in chemin:
-            centre_x = (x + 0.5) * largeur_case
-            centre_y = (y + 0.5) * hauteur_case
-            path.lineTo(centre_x, centre_y)
-        
-        # Créer l'item de chemin
-        chemin_item = QGraphicsPathItem(path)
-        crayon_bleu = QPen(QColor(0, 0, 255))
-        crayon_bleu.setWidth(3)
-        crayon_bleu.setStyle(Qt.PenStyle.DashLine)
-        chemin_item.setPen(crayon_bleu)
-        self.addItem(chemin_item)
-        self.lignes_chemin.append(chemin_item)
-        
-        # Ajouter des numéros pour chaque étape du chemin
-        for i, (produit, (x, y)) in enumerate(chemin):
-            centre_x = (x + 0.5) * largeur_case
-            centre_y = (y + 0.5) * hauteur_case
-            
-            # Cercle pour num
-            rayon = min(largeur_case, hauteur_case) * 0.2
-            cercle = QGraphicsEllipseItem(centre_x - rayon, centre_y - rayon, rayon * 2, rayon * 2)
-            cercle.setBrush(QBrush(QColor(0, 0, 255, 150)))
-            cercle.setPen(QPen(QColor(0, 0, 150)))
-            self.addItem(cercle)
-            self.lignes_chemin.append(cercle)
-            
-            # Numéro
-            numero = QGraphicsTextItem(str(i + 1))
-            numero.setFont(QFont("Arial", 10, QFont.Weight.Bold))
-            numero.setDefaultTextColor(QColor(255, 255, 255))
-            numero.setPos(centre_x - numero.boundingRect().width() / 2, 
-                         centre_y - numero.boundingRect().height() / 2)
-            self.addItem(numero)
-            self.lignes_chemin.append(numero)
+        # Cases à relier : trajet dans les allées, sinon ligne droite entre étapes
+        if trajet:
+            cases = trajet
+        else:
+            cases = [self.point_depart] + [position for _, position in chemin]
+            if self.point_arrivee is not None: cases.append(self.point_arrivee)
+        points = QPolygonF([QPointF((x + 0.5) * largeur_case, (y + 0.5) * hauteur_case) for x, y in cases])
+        
+        # indice du tracé où chaque étape est atteinte (pour le dévoilement progressif)
+        indices, k = [], 0
+        for _, position in chemin:
+            while k < len(cases) - 1 and tuple(cases[k]) != tuple(position): k += 1
+            indices.append(k)
+        
+        centres = [QPointF((x + 0.5) * largeur_case, (y + 0.5) * hauteur_case) for _, (x, y) in chemin]
+        return {'points': points, 'centres': centres, 'indices': indices,
+                'rayon': min(largeur_case, hauteur_case) * 0.2, 'couleur': couleur}
 
 # gerer le rendu du plan du magasin
 class Rendu(QGraphicsView):
@@ -273,15 +519,25 @@ class Rendu(QGraphicsView):
         if self.scene() and self.scene().sceneRect().width() > 0:
             self.fitInView(self.scene().sceneRect(), Qt.AspectRatioMode.KeepAspectRatio)
     
+    def fitInView(self, *args):
+        super().fitInView(*args)
+        self.mettre_a_jour_niveau_detail()
+    
     def centrer_sur_point(self, point):
         if point: self.centerOn(point)
     
     def wheelEvent(self, event):
         self.scale(1.1 if event.angleDelta().y() > 0 else 0.9, 1.1 if event.angleDelta().y() > 0 else 0.9)
+        self.mettre_a_jour_niveau_detail()
+    
+    # transmet l'échelle courante à la scène (niveau de détail)
+    def mettre_a_jour_niveau_detail(self):
+        self.scene().definir_echelle(self.transform().m11())
 
 class MaxiMarketMainWindow(QMainWindow):
     produit_selectionne = pyqtSignal(str)
     ajouter_produit_demande = pyqtSignal(str, int)
+    retirer_produit_demande = pyqtSignal(str)
     produit_liste_selectionne = pyqtSignal(str)
     generer_liste_demande = pyqtSignal()
     reinitialiser_liste_demande = pyqtSignal()
@@ -356,6 +612,10 @@ class MaxiMarketMainWindow(QMainWindow):
         self.liste_widget.setFont(QFont("Arial", 10))
         liste_layout.addWidget(self.liste_widget)
         
+        self.retirer_produit_btn = QPushButton("Retirer")
+        self.retirer_produit_btn.setMaximumHeight(25)
+        liste_layout.addWidget(self.retirer_produit_btn)
+        
         # Boutons generer, réinitialiser, enregistrer et calculer le chemin
         self.generer_btn = QPushButton("Générer liste")
         self.generer_btn.setMaximumHeight(25)
@@ -369,6 +629,14 @@ class MaxiMarketMainWindow(QMainWindow):
         self.enregistrer_btn.setMaximumHeight(25)
         liste_layout.addWidget(self.enregistrer_btn)
         
+        preparateurs_layout = QHBoxLayout()
+        preparateurs_layout.addWidget(QLabel("Préparateurs :"))
+        self.preparateurs_spin = QSpinBox()
+        self.preparateurs_spin.setRange(1, len(COULEURS_PREPARATEURS))
+        self.preparateurs_spin.setMaximumHeight(25)
+        preparateurs_layout.addWidget(self.preparateurs_spin)
+        liste_layout.addLayout(preparateurs_layout)
+        
         self.calculer_chemin_btn = QPushButton("Calculer chemin")
         self.calculer_chemin_btn.setMaximumHeight(25)
         liste_layout.addWidget(self.calculer_chemin_btn)
@@ -412,6 +680,7 @@ class MaxiMarketMainWindow(QMainWindow):
         self.projet_combo.currentIndexChanged.connect(self.on_projet_selectionne)
         self.produit_menu.currentIndexChanged.connect(lambda: self.produit_selectionne.emit(self.produit_menu.currentText()))
         self.ajouter_produit_btn.clicked.connect(self.ajouter_produit)
+        self.retirer_produit_btn.clicked.connect(self.retirer_produit)
         self.liste_widget.currentItemChanged.connect(self.selection_liste_changee)
         self.generer_btn.clicked.connect(self.generer_liste_demande.emit)
         self.reinitialiser_btn.clicked.connect(self.reinitialiser_liste_demande.emit)
@@ -431,6 +700,11 @@ class MaxiMarketMainWindow(QMainWindow):
         produit = self.produit_menu.currentText()
         if produit: self.ajouter_produit_demande.emit(produit, 1)
     
+    # Permet de retirer le produit sélectionné de la liste de courses
+    def retirer_produit(self):
+        item = self.liste_widget.currentItem()
+        if item: self.retirer_produit_demande.emit(item.text())
+    
     # Permet de maj la sélection de produit dans la liste
     def selection_liste_changee(self, current, previous):
         if current: self.produit_liste_selectionne.emit(current.text())
@@ -446,7 +720,7 @@ class MaxiMarketMainWindow(QMainWindow):
     def mettre_a_jour_projets(self, projets):
         self.projet_combo.clear()
         for projet in projets:
-            self.projet_combo.addItem(f"{projet['nom_projet']} - {projet['nom_magasin']}", projet['fichier'])
+            self.projet_combo.addItem(f"{projet['nom_projet']} - {projet['nom_magasin']}", projet)
     
     # Permet de maj la liste des produits
     def mettre_a_jour_produits(self, produits):
@@ -464,6 +738,10 @@ class MaxiMarketMainWindow(QMainWindow):
     def ajouter_item_liste(self, produit): self.liste_widget.addItem(produit)
     def vider_liste(self): self.liste_widget.clear()
     
+    def retirer_item_liste(self, produit):
+        for item in self.liste_widget.findItems(produit, Qt.MatchFlag.MatchExactly):
+            self.liste_widget.takeItem(self.liste_widget.row(item))
+    
     # permet de maj la table de chemin
     def mettre_a_jour_table_chemin(self, chemin):
         self.table_chemin.setRowCount(len(chemin))
@@ -472,6 +750,18 @@ class MaxiMarketMainWindow(QMainWindow):
             self.table_chemin.setItem(i, 1, QTableWidgetItem(produit))
             self.table_chemin.setItem(i, 2, QTableWidgetItem(f"({x}, {y})"))
     
+    # permet de maj la table avec un chemin par préparateur
+    def mettre_a_jour_table_chemins(self, chemins):
+        lignes = [(f"P{p + 1} - {i + 1}", produit, position)
+                  for p, chemin in enumerate(chemins) for i, (produit, position) in enumerate(chemin)]
+        self.table_chemin.setRowCount(len(lignes))
+        for ligne, (ordre, produit, (x, y)) in enumerate(lignes):
+            self.table_chemin.setItem(ligne, 0, QTableWidgetItem(ordre))
+            self.table_chemin.setItem(ligne, 1, QTableWidgetItem(produit))
+            self.table_chemin.setItem(ligne, 2, QTableWidgetItem(f"({x}, {y})"))
+    
+    def get_nb_preparateurs(self): return self.preparateurs_spin.value()
+    
     # permet de vider la table de chemin
     def vider_table_chemin(self):
         self.table_chemin.setRowCount(0)
@@ -0,0 +1,188 @@
+import json
+import sqlite3
+from contextlib import contextmanager
+
+# Module commun aux deux applications (importé depuis application_1 et application_2).
+#
+# Dépôt SQLite des projets d'une chaîne de magasins (un magasin par projet) : produits,
+# assortiments, placements et listes de courses, lu et écrit par l'éditeur comme par le visualiseur
+# Les projets entrent et sortent au format des fichiers JSON (dictionnaire "nom_projet", "placements" "x,y"...)
+
+NOM_DEPOT = "magasins.db"
+EXTENSION_DEPOT = ".db"
+
+# champs du projet rangés dans des colonnes, les autres restent dans metadonnees (JSON)
+COLONNES_MAGASIN = ("nom_projet", "nom_magasin", "adresse_magasin", "chemin_plan", "nb_rangs", "nb_rayons")
+# calculés au chargement, jamais enregistrés
+CHAMPS_IGNORES = ("produits_magasin", "placements", "chemin_plan_absolu")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS magasins (
+    id INTEGER PRIMARY KEY,
+    nom_projet TEXT NOT NULL UNIQUE,
+    nom_magasin TEXT NOT NULL DEFAULT '',
+    adresse_magasin TEXT NOT NULL DEFAULT '',
+    chemin_plan TEXT NOT NULL DEFAULT '',
+    nb_rangs INTEGER NOT NULL,
+    nb_rayons INTEGER NOT NULL,
+    metadonnees TEXT NOT NULL DEFAULT '{}'
+);
+CREATE TABLE IF NOT EXISTS produits (
+    id INTEGER PRIMARY KEY,
+    nom TEXT NOT NULL UNIQUE,
+    categorie TEXT
+);
+CREATE INDEX IF NOT EXISTS produits_categorie ON produits(categorie);
+CREATE TABLE IF NOT EXISTS assortiments (
+    magasin INTEGER NOT NULL REFERENCES magasins(id) ON DELETE CASCADE,
+    produit INTEGER NOT NULL REFERENCES produits(id),
+    rang INTEGER NOT NULL,
+    PRIMARY KEY (magasin, produit)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS assortiments_produit ON assortiments(produit);
+CREATE TABLE IF NOT EXISTS placements (
+    magasin INTEGER NOT NULL REFERENCES magasins(id) ON DELETE CASCADE,
+    x INTEGER NOT NULL,
+    y INTEGER NOT NULL,
+    produit INTEGER NOT NULL REFERENCES produits(id),
+    PRIMARY KEY (magasin, x, y)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS placements_produit ON placements(produit, magasin);
+CREATE TABLE IF NOT EXISTS listes (
+    id INTEGER PRIMARY KEY,
+    magasin INTEGER NOT NULL REFERENCES magasins(id) ON DELETE CASCADE,
+    nom TEXT NOT NULL,
+    UNIQUE (magasin, nom)
+);
+CREATE TABLE IF NOT EXISTS lignes_listes (
+    liste INTEGER NOT NULL REFERENCES listes(id) ON DELETE CASCADE,
+    rang INTEGER NOT NULL,
+    produit INTEGER NOT NULL REFERENCES produits(id),
+    PRIMARY KEY (liste, rang)
+) WITHOUT ROWID;
+"""
+
+# nombre de paramètres par requête "IN (...)", sous la limite de SQLite
+TAILLE_PAQUET = 500
+
+class DepotMagasins:
+    def __init__(self, chemin):
+        self.chemin = chemin
+        self.connexion = sqlite3.connect(chemin)
+        self.connexion.execute("PRAGMA foreign_keys = ON")
+        self.connexion.execute("PRAGMA journal_mode = WAL")
+        self.connexion.executescript(SCHEMA)
+        self.profondeur = 0
+
+    def fermer(self):
+        self.connexion.close()
+
+    # Transaction : validée à la sortie du bloc le plus externe, annulée entièrement en cas d'erreur
+    @contextmanager
+    def transaction(self):
+        self.profondeur += 1
+        try:
+            if self.profondeur > 1:
+                yield self.connexion
+            else:
+                with self.connexion:
+                    yield self.connexion
+        finally:
+            self.profondeur -= 1
+
+    # Identifiants des produits (créés au besoin) : nom -> id
+    def identifiants_produits(self, noms):
+        noms = list(dict.fromkeys(noms))
+        identifiants = {}
+        with self.transaction() as connexion:
+            connexion.executemany("INSERT OR IGNORE INTO produits (nom) VALUES (?)", ((nom,) for nom in noms))
+            for debut in range(0, len(noms), TAILLE_PAQUET):
+                paquet = noms[debut:debut + TAILLE_PAQUET]
+                requete = f"SELECT nom, id FROM produits WHERE nom IN ({','.join('?' * len(paquet))})"
+                identifiants.update(connexion.execute(requete, paquet))
+        return identifiants
+
+    def identifiant_magasin(self, nom_projet):
+        ligne = self.connexion.execute("SELECT id FROM magasins WHERE nom_projet = ?", (nom_projet,)).fetchone()
+        return ligne[0] if ligne else None
+
+    # Catégories des produits (nom de catégorie -> liste de produits, comme Ressources/produits_selectionnes.json)
+    def definir_categories(self, categories):
+        with self.transaction() as connexion:
+            connexion.executemany(
+                "INSERT INTO produits (nom, categorie) VALUES (?, ?) ON CONFLICT(nom) DO UPDATE SET categorie = excluded.categorie",
+                ((produit, categorie) for categorie, produits in categories.items() for produit in produits))
+
+    # Enregistre (ou remplace) un projet, placements et assortiment compris, en une transaction
+    def enregistrer_projet(self, projet):
+        produits_magasin = list(projet.get("produits_magasin", []))
+        placements = [(*map(int, coord.split(",")), produit) for coord, produit in projet.get("placements", {}).items()]
+        metadonnees = {cle: valeur for cle, valeur in projet.items() if cle not in COLONNES_MAGASIN + CHAMPS_IGNORES}
+        valeurs = (projet["nom_projet"], projet.get("nom_magasin", ""), projet.get("adresse_magasin", ""),
+                   projet.get("chemin_plan", ""), projet.get("nb_rangs", 24), projet.get("nb_rayons", 40),
+                   json.dumps(metadonnees, ensure_ascii=False))
+
+        with self.transaction() as connexion:
+            identifiants = self.identifiants_produits(produits_magasin + [produit for _, _, produit in placements])
+            connexion.execute(
+                "INSERT INTO magasins (nom_projet, nom_magasin, adresse_magasin, chemin_plan, nb_rangs, nb_rayons, metadonnees) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT(nom_projet) DO UPDATE SET "
+                "nom_magasin = excluded.nom_magasin, adresse_magasin = excluded.adresse_magasin, "
+                "chemin_plan = excluded.chemin_plan, nb_rangs = excluded.nb_rangs, "
+                "nb_rayons = excluded.nb_rayons, metadonnees = excluded.metadonnees", valeurs)
+            magasin = self.identifiant_magasin(projet["nom_projet"])
+            connexion.execute("DELETE FROM assortiments WHERE magasin = ?", (magasin,))
+            connexion.execute("DELETE FROM placements WHERE magasin = ?", (magasin,))
+            connexion.executemany("INSERT OR IGNORE INTO assortiments (magasin, produit, rang) VALUES (?, ?, ?)",
+                                  ((magasin, identifiants[produit], rang) for rang, produit in enumerate(produits_magasin)))
+            connexion.executemany("INSERT OR REPLACE INTO placements (magasin, x, y, produit) VALUES (?, ?, ?, ?)",
+                                  ((magasin, x, y, identifiants[produit]) for x, y, produit in placements))
+        return magasin
+
+    # Projet au format des fichiers JSON, None s'il n'est pas dans le dépôt
+    def charger_projet(self, nom_projet):
+        ligne = self.connexion.execute(
+            f"SELECT id, {', '.join(COLONNES_MAGASIN)}, metadonnees FROM magasins WHERE nom_projet = ?", (nom_projet,)).fetchone()
+        if ligne is None:
+            return None
+        magasin = ligne[0]
+        projet = json.loads(ligne[-1])
+        projet.update(zip(COLONNES_MAGASIN, ligne[1:-1]))
+        projet["produits_magasin"] = [nom for nom, in self.connexion.execute(
+            "SELECT p.nom FROM assortiments a JOIN produits p ON p.id = a.produit WHERE a.magasin = ? ORDER BY a.rang", (magasin,))]
+        projet["placements"] = {f"{x},{y}": nom for x, y, nom in self.connexion.execute(
+            "SELECT pl.x, pl.y, p.nom FROM placements pl JOIN produits p ON p.id = pl.produit WHERE pl.magasin = ?", (magasin,))}
+        return projet
+
+    def supprimer_projet(self, nom_projet):
+        with self.transaction() as connexion:
+            connexion.execute("DELETE FROM magasins WHERE nom_projet = ?", (nom_projet,))
+
+    # Projets du dépôt, comme ProjetModel.get_projets_disponibles
+    def projets(self):
+        return [{"nom_projet": nom_projet, "nom_magasin": nom_magasin, "adresse_magasin": adresse}
+                for nom_projet, nom_magasin, adresse in self.connexion.execute(
+                    "SELECT nom_projet, nom_magasin, adresse_magasin FROM magasins ORDER BY nom_projet")]
+
+    # Magasins qui vendent un produit (assortiment), lus par l'index produit
+    def magasins_avec_produit(self, produit):
+        return [{"nom_projet": nom_projet, "nom_magasin": nom_magasin} for nom_projet, nom_magasin in self.connexion.execute(
+            "SELECT m.nom_projet, m.nom_magasin FROM produits p JOIN assortiments a ON a.produit = p.id "
+            "JOIN magasins m ON m.id = a.magasin WHERE p.nom = ? ORDER BY m.nom_projet", (produit,))]
+
+    # Produits d'une catégorie, lus par l'index des catégories
+    def produits_categorie(self, categorie):
+        return [nom for nom, in self.connexion.execute("SELECT nom FROM produits WHERE categorie = ? ORDER BY nom", (categorie,))]
+
+    # Enregistre (ou remplace) une liste de courses d'un magasin
+    def enregistrer_liste(self, nom_projet, nom, produits):
+        magasin = self.identifiant_magasin(nom_projet)
+        if magasin is None:
+            raise KeyError(f"Projet absent du dépôt : {nom_projet}")
+        with self.transaction() as connexion:
+            identifiants = self.identifiants_produits(produits)
+            connexion.execute("INSERT OR IGNORE INTO listes (magasin, nom) VALUES (?, ?)", (magasin, nom))
+            liste, = connexion.execute("SELECT id FROM listes WHERE magasin = ? AND nom = ?", (magasin, nom)).fetchone()
+            connexion.execute("DELETE FROM lignes_listes WHERE liste = ?", (liste,))
+            connexion.executemany("INSERT INTO lignes_listes (liste, rang, produit) VALUES (?, ?, ?)",
+                                  ((liste, rang, identifiants[produit]) for rang, produit in enumerate(produits)))
@@ -0,0 +1,466 @@
+import os
+import math
+import atexit
+import hashlib
+from collections import OrderedDict
+from PyQt6.QtCore import Qt, QObject, QRect, QRectF, QSize, QThreadPool, pyqtSignal
+from PyQt6.QtGui import QColor, QImage, QImageIOHandler, QImageReader, QPixmap
+from PyQt6.QtWidgets import QGraphicsItem
+from PyQt6 import sip
+
+# Module commun aux deux applications (importé depuis application_1 et application_2).
+#
+# Plans de très grande taille : découpés en une pyramide de tuiles gardée sur disque,
+# seules les tuiles visibles sont décodées et gardées en mémoire.
+# Les formats lisibles par zone (JPEG) sont décodés tuile par tuile à la demande ; les autres
+# (PNG, BMP, TIFF...) sont décodés une seule fois en entier, en arrière-plan, pour écrire toute la pyramide.
+# Tout décodage se fait dans les fils du pool : la peinture ne montre que les tuiles déjà prêtes.
+
+TAILLE_TUILE = 512
+# au-delà de ce nombre de pixels le plan n'est plus décodé en un seul QPixmap
+SEUIL_TUILES = 4096 * 4096
+# mémoire maximale occupée par les tuiles décodées, tous plans confondus (octets)
+BUDGET_MEMOIRE = 256 * 1024 * 1024
+DOSSIER_TUILES = os.path.join(os.path.expanduser("~"), ".cache", "maximarket", "tuiles")
+# mémoire maximale des plans décodés gardés d'un chargement à l'autre (octets)
+TAILLE_CACHE_PLANS = 512 * 1024 * 1024
+# les niveaux réduits d'un plan s'arrêtent sous cette taille (pixels)
+TAILLE_MIN_NIVEAU = 256
+# nombre de plans dont les niveaux réduits restent en mémoire
+NB_PLANS_NIVEAUX = 8
+# mémoire maximale pour décoder en entier un plan non lisible par zone (Mo) :
+# au-delà, le plan doit être converti dans un format lisible par zone (JPEG)
+LIMITE_DECODAGE_MO = 2048
+# couleur peinte à la place d'une tuile en cours de décodage
+COULEUR_ATTENTE = QColor(235, 235, 235)
+
+# Vrai si le plan est trop grand pour être décodé d'un bloc (lecture de l'en-tête seulement)
+def plan_en_tuiles(chemin_image):
+    taille = QImageReader(chemin_image).size()
+    return taille.isValid() and taille.width() * taille.height() > SEUIL_TUILES
+
+# Plan chargé selon sa taille : QPixmap ou pyramide de tuiles (mêmes width() / height())
+# un même fichier n'est décodé qu'une fois tant qu'il reste dans le cache
+def charger_image_plan(chemin_image):
+    return CACHE_PLANS.obtenir(chemin_image, decoder_plan)
+
+def decoder_plan(chemin_image):
+    if plan_en_tuiles(chemin_image):
+        return PyramideTuiles(chemin_image)
+    return QPixmap(chemin_image)
+
+# Cache des plans décodés partagé par tout le processus (modèles et scènes),
+# clé : chemin, date de modification et taille du fichier ; éviction LRU au-delà de taille_max
+class CachePlans:
+    def __init__(self, taille_max=TAILLE_CACHE_PLANS):
+        self.taille_max = taille_max
+        self.entrees = OrderedDict()
+        self.octets = 0
+        self.succes = 0
+        self.echecs = 0
+
+    def cle(self, chemin_image):
+        infos = os.stat(chemin_image)
+        return os.path.abspath(chemin_image), infos.st_mtime_ns, infos.st_size
+
+    def obtenir(self, chemin_image, charger):
+        cle = self.cle(chemin_image)
+        if cle in self.entrees:
+            self.entrees.move_to_end(cle)
+            self.succes += 1
+            return self.entrees[cle][0]
+
+        self.echecs += 1
+        plan = charger(chemin_image)
+        if isinstance(plan, QPixmap) and plan.isNull():
+            return plan
+
+        # une version modifiée du fichier remplace l'ancienne
+        for ancienne in [c for c in self.entrees if c[0] == cle[0]]:
+            self.retirer(ancienne)
+
+        # les tuiles d'une pyramide sont comptées dans MEMOIRE_TUILES
+        taille = plan.width() * plan.height() * plan.depth() // 8 if isinstance(plan, QPixmap) else 0
+        self.entrees[cle] = (plan, taille)
+        self.octets += taille
+        while self.octets > self.taille_max and len(self.entrees) > 1:
+            self.retirer(next(iter(self.entrees)))
+        return plan
+
+    def retirer(self, cle):
+        plan, taille = self.entrees.pop(cle)
+        self.octets -= taille
+        if isinstance(plan, PyramideTuiles):
+            plan.vider_memoire()
+
+    def vider(self):
+        for cle in list(self.entrees):
+            self.retirer(cle)
+
+CACHE_PLANS = CachePlans()
+
+# Tuiles décodées de toutes les pyramides, sous un seul budget :
+# clé (dossier de la pyramide, niveau, i, j), les plus anciennes évincées au-delà du budget
+class MemoireTuiles:
+    def __init__(self, budget=BUDGET_MEMOIRE):
+        self.budget = budget
+        self.tuiles = OrderedDict()
+        self.octets = 0
+
+    def obtenir(self, cle):
+        pixmap = self.tuiles.get(cle)
+        if pixmap is not None:
+            self.tuiles.move_to_end(cle)
+        return pixmap
+
+    def contient(self, cle):
+        return cle in self.tuiles
+
+    def garder(self, cle, pixmap):
+        if cle in self.tuiles:
+            self.retirer(cle)
+        self.tuiles[cle] = pixmap
+        self.octets += pixmap.width() * pixmap.height() * 4
+        while self.octets > self.budget and len(self.tuiles) > 1:
+            self.retirer(next(iter(self.tuiles)))
+        return pixmap
+
+    def retirer(self, cle):
+        pixmap = self.tuiles.pop(cle)
+        self.octets -= pixmap.width() * pixmap.height() * 4
+
+    # Retire les tuiles d'une pyramide
+    def vider(self, dossier=None):
+        for cle in [c for c in self.tuiles if dossier is None or c[0] == dossier]:
+            self.retirer(cle)
+
+MEMOIRE_TUILES = MemoireTuiles()
+
+# Item graphique adapté au plan chargé
+def creer_item_plan(plan):
+    if isinstance(plan, PyramideTuiles):
+        return PlanTuile(plan)
+    return PlanMipmap(plan)
+
+# Pyramide de tuiles d'une image : niveau k = image réduite 2^k fois,
+# jusqu'au niveau qui tient dans une seule tuile
+class PyramideTuiles(QObject):
+    # émis quand des tuiles sont prêtes à peindre (pyramide construite, tuile décodée)
+    tuiles_pretes = pyqtSignal()
+    # émis depuis un fil du pool pour chaque tuile lue ou décodée (image nulle en cas d'échec)
+    tuile_decodee = pyqtSignal(int, int, int, QImage)
+
+    def __init__(self, chemin_image, memoire=MEMOIRE_TUILES, dossier=DOSSIER_TUILES):
+        super().__init__()
+        self.chemin = chemin_image
+        lecteur = QImageReader(chemin_image)
+        taille = lecteur.size()
+        # lecture d'une zone seulement, réduite ou non, par le lecteur du format
+        options = QImageIOHandler.ImageOption
+        self.lecture_par_zone = all(lecteur.supportsOption(option) for option in
+                                    (options.ClipRect, options.ScaledSize, options.ScaledClipRect))
+        self.largeur, self.hauteur = taille.width(), taille.height()
+        self.nb_niveaux = 1
+        while max(self.largeur, self.hauteur) > TAILLE_TUILE * 2 ** (self.nb_niveaux - 1):
+            self.nb_niveaux += 1
+
+        # tuiles sur disque propres à ce fichier et à cette version du fichier
+        infos = os.stat(chemin_image)
+        cle = f"{os.path.abspath(chemin_image)}|{infos.st_mtime_ns}|{infos.st_size}"
+        self.dossier = os.path.join(dossier, hashlib.sha1(cle.encode("utf-8")).hexdigest())
+
+        # tuiles décodées, dans la mémoire partagée par toutes les pyramides,
+        # et tuiles (niveau, i, j) en cours de lecture dans un fil du pool
+        self.memoire = memoire
+        self.en_cours = set()
+        self.tuile_decodee.connect(self.garder_tuile)
+
+        # sans lecture par zone, la pyramide est construite une fois (ou reprise du disque)
+        self.construction = False
+        self.prete = self.lecture_par_zone or os.path.exists(self.fichier_complet())
+        if not self.prete:
+            self.construire()
+
+    def width(self):
+        return self.largeur
+
+    def height(self):
+        return self.hauteur
+
+    # Taille de l'image réduite au niveau donné
+    def taille_niveau(self, niveau):
+        facteur = 2 ** niveau
+        return math.ceil(self.largeur / facteur), math.ceil(self.hauteur / facteur)
+
+    def nb_tuiles(self, niveau):
+        largeur, hauteur = self.taille_niveau(niveau)
+        return math.ceil(largeur / TAILLE_TUILE), math.ceil(hauteur / TAILLE_TUILE)
+
+    # Niveau le plus réduit qui garde au moins un pixel d'image par pixel écran
+    def niveau_pour_echelle(self, echelle):
+        if echelle <= 0:
+            return self.nb_niveaux - 1
+        niveau = int(math.floor(math.log2(1 / echelle))) if echelle < 1 else 0
+        return max(0, min(niveau, self.nb_niveaux - 1))
+
+    # Rectangle couvert par une tuile, en pixels de l'image d'origine
+    def rect_tuile(self, niveau, i, j):
+        facteur = 2 ** niveau
+        x, y = i * TAILLE_TUILE * facteur, j * TAILLE_TUILE * facteur
+        largeur = min(TAILLE_TUILE * facteur, self.largeur - x)
+        hauteur = min(TAILLE_TUILE * facteur, self.hauteur - y)
+        return QRectF(x, y, largeur, hauteur)
+
+    def fichier_tuile(self, niveau, i, j):
+        return os.path.join(self.dossier, f"{niveau}_{i}_{j}.png")
+
+    # Marque d'une pyramide entièrement écrite sur disque
+    def fichier_complet(self):
+        return os.path.join(self.dossier, "complet")
+
+    # Tuile décodée si elle est en mémoire, sinon None (precharger lance la lecture des autres,
+    # l'item est repeint quand elles sont prêtes)
+    def tuile(self, niveau, i, j):
+        return self.memoire.obtenir((self.dossier, niveau, i, j))
+
+    # Lance la lecture des tuiles données d'un niveau dans un fil du pool
+    # (rien tant que la pyramide construite en arrière-plan n'est pas prête)
+    def demander(self, niveau, tuiles):
+        tuiles = [(i, j) for i, j in tuiles if (niveau, i, j) not in self.en_cours]
+        if not tuiles or not self.prete:
+            return
+        self.en_cours.update((niveau, i, j) for i, j in tuiles)
+        QThreadPool.globalInstance().start(lambda: self.lire(niveau, tuiles))
+
+    # Exécuté dans un fil du pool (QImage seulement) : les tuiles écrites sur disque y sont relues,
+    # les autres décodées ensemble dans le fichier source
+    def lire(self, niveau, tuiles):
+        manquantes = []
+        for i, j in tuiles:
+            image = QImage(self.fichier_tuile(niveau, i, j))
+            if image.isNull():
+                manquantes.append((i, j))
+            else:
+                self.tuile_decodee.emit(niveau, i, j, image)
+        if manquantes and self.lecture_par_zone:
+            self.decoder(niveau, manquantes)
+        else:
+            for i, j in manquantes:
+                self.tuile_decodee.emit(niveau, i, j, QImage())
+
+    # Dans le fil principal (connexion en file) : la tuile passe en mémoire, les QPixmap n'existent que là
+    def garder_tuile(self, niveau, i, j, image):
+        self.en_cours.discard((niveau, i, j))
+        if image.isNull():
+            # tuiles effacées du disque : la pyramide est reconstruite
+            if not self.lecture_par_zone:
+                self.construire()
+            return
+        self.memoire.garder((self.dossier, niveau, i, j), QPixmap.fromImage(image))
+        self.tuiles_pretes.emit()
+
+    # Lance la construction de toute la pyramide dans un fil du pool
+    def construire(self):
+        if self.construction:
+            return
+        self.construction = True
+        self.prete = False
+        QThreadPool.globalInstance().start(self.construire_pyramide)
+
+    # Exécuté dans un fil du pool (QImage seulement) : un seul décodage du fichier,
+    # jusqu'à LIMITE_DECODAGE_MO, puis chaque niveau réduit depuis le précédent
+    def construire_pyramide(self):
+        lecteur = QImageReader(self.chemin)
+        lecteur.setAllocationLimit(LIMITE_DECODAGE_MO)
+        image = lecteur.read()
+        if image.isNull():
+            print(f"Erreur lors du décodage du plan {self.chemin}: {lecteur.errorString()}")
+            self.construction = False
+            return
+
+        try:
+            os.makedirs(self.dossier, exist_ok=True)
+            for niveau in range(self.nb_niveaux):
+                if niveau > 0:
+                    image = image.scaled(*self.taille_niveau(niveau), Qt.AspectRatioMode.IgnoreAspectRatio,
+                                         Qt.TransformationMode.SmoothTransformation)
+                colonnes, lignes = self.nb_tuiles(niveau)
+                for j in range(lignes):
+                    for i in range(colonnes):
+                        image.copy(i * TAILLE_TUILE, j * TAILLE_TUILE, min(TAILLE_TUILE, image.width() - i * TAILLE_TUILE),
+                                   min(TAILLE_TUILE, image.height() - j * TAILLE_TUILE)).save(self.fichier_tuile(niveau, i, j))
+            open(self.fichier_complet(), "w").close()
+        except OSError as e:
+            print(f"Erreur lors de l'écriture des tuiles: {str(e)}")
+            self.construction = False
+            return
+
+        self.prete = True
+        self.construction = False
+        self.tuiles_pretes.emit()
+
+    # Prépare les tuiles d'un bloc : celles absentes de la mémoire sont lues ensemble, dans un fil du pool
+    def precharger(self, niveau, i_min, i_max, j_min, j_max):
+        self.demander(niveau, [(i, j) for j in range(j_min, j_max + 1) for i in range(i_min, i_max + 1)
+                               if not self.memoire.contient((self.dossier, niveau, i, j))])
+
+    # Exécuté dans un fil du pool : décode uniquement la zone des tuiles données (réduite par le lecteur
+    # pour les niveaux > 0), puis la découpe en tuiles écrites sur disque et envoyées au fil principal
+    def decoder(self, niveau, tuiles):
+        i_min, i_max = min(i for i, _ in tuiles), max(i for i, _ in tuiles)
+        j_min, j_max = min(j for _, j in tuiles), max(j for _, j in tuiles)
+        largeur, hauteur = self.taille_niveau(niveau)
+        x, y = i_min * TAILLE_TUILE, j_min * TAILLE_TUILE
+        zone = QRect(x, y, min((i_max + 1) * TAILLE_TUILE, largeur) - x, min((j_max + 1) * TAILLE_TUILE, hauteur) - y)
+        lecteur = QImageReader(self.chemin)
+        if niveau == 0:
+            lecteur.setClipRect(zone)
+        else:
+            lecteur.setScaledSize(QSize(largeur, hauteur))
+            lecteur.setScaledClipRect(zone)
+        image = lecteur.read()
+        if image.isNull():
+            print(f"Erreur lors du décodage du plan {self.chemin}: {lecteur.errorString()}")
+            for i, j in tuiles:
+                self.tuile_decodee.emit(niveau, i, j, QImage())
+            return
+
+        try:
+            os.makedirs(self.dossier, exist_ok=True)
+        except OSError as e:
+            print(f"Erreur lors de la création du dossier des tuiles: {str(e)}")
+        for i, j in tuiles:
+            tuile = image.copy((i - i_min) * TAILLE_TUILE, (j - j_min) * TAILLE_TUILE, TAILLE_TUILE, TAILLE_TUILE)
+            tuile = tuile.copy(0, 0, min(TAILLE_TUILE, largeur - i * TAILLE_TUILE), min(TAILLE_TUILE, hauteur - j * TAILLE_TUILE))
+            tuile.save(self.fichier_tuile(niveau, i, j))
+            self.tuile_decodee.emit(niveau, i, j, tuile)
+
+    def vider_memoire(self):
+        self.memoire.vider(self.dossier)
+
+# Item graphique d'un plan en tuiles : ne peint que les tuiles de la zone exposée,
+# au niveau de réduction adapté au zoom
+class PlanTuile(QGraphicsItem):
+    def __init__(self, pyramide):
+        super().__init__()
+        self.pyramide = pyramide
+        self.pyramide.tuiles_pretes.connect(self.rafraichir)
+        self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemUsesExtendedStyleOption)
+        self.setAcceptedMouseButtons(Qt.MouseButton.NoButton)
+
+    def boundingRect(self):
+        return QRectF(0, 0, self.pyramide.width(), self.pyramide.height())
+
+    # La pyramide survit à l'item (cache des plans) : rien à repeindre si la scène l'a détruit
+    def rafraichir(self):
+        if not sip.isdeleted(self):
+            self.update()
+
+    def paint(self, painter, option, widget=None):
+        niveau = self.pyramide.niveau_pour_echelle(painter.worldTransform().m11())
+        cote = TAILLE_TUILE * 2 ** niveau
+        colonnes, lignes = self.pyramide.nb_tuiles(niveau)
+        zone = option.exposedRect
+        i_min, i_max = max(0, int(zone.left() // cote)), min(colonnes - 1, int(zone.right() // cote))
+        j_min, j_max = max(0, int(zone.top() // cote)), min(lignes - 1, int(zone.bottom() // cote))
+        self.pyramide.precharger(niveau, i_min, i_max, j_min, j_max)
+        for j in range(j_min, j_max + 1):
+            for i in range(i_min, i_max + 1):
+                rect = self.pyramide.rect_tuile(niveau, i, j)
+                pixmap = self.pyramide.tuile(niveau, i, j)
+                if pixmap is not None:
+                    painter.drawPixmap(rect, pixmap, QRectF(pixmap.rect()))
+                else:
+                    self.peindre_attente(painter, niveau, i, j, rect)
+
+    # Tuile pas encore prête : partie d'une tuile plus réduite déjà en mémoire, sinon aplat
+    def peindre_attente(self, painter, niveau, i, j, rect):
+        for plus_reduit in range(niveau + 1, self.pyramide.nb_niveaux):
+            ecart = plus_reduit - niveau
+            pixmap = self.pyramide.tuile(plus_reduit, i >> ecart, j >> ecart)
+            if pixmap is not None:
+                englobant = self.pyramide.rect_tuile(plus_reduit, i >> ecart, j >> ecart)
+                facteur = 2 ** plus_reduit
+                source = QRectF((rect.x() - englobant.x()) / facteur, (rect.y() - englobant.y()) / facteur,
+                                rect.width() / facteur, rect.height() / facteur)
+                painter.drawPixmap(rect, pixmap, source)
+                return
+        painter.fillRect(rect, COULEUR_ATTENTE)
+
+# Niveaux réduits d'un plan (1/2, 1/4, ...) calculés en arrière-plan ;
+# le niveau 0 est le plan lui-même, disponible tout de suite
+class NiveauxPlan(QObject):
+    niveau_pret = pyqtSignal(int, QImage)
+    niveaux_changes = pyqtSignal()
+
+    def __init__(self, pixmap):
+        super().__init__()
+        self.niveaux = [pixmap]
+        self.niveau_pret.connect(self.ajouter_niveau)
+        image = pixmap.toImage()
+        QThreadPool.globalInstance().start(lambda: self.generer(image))
+
+    # Exécuté dans un fil du pool : chaque niveau est réduit depuis le précédent
+    def generer(self, image):
+        niveau = 0
+        while min(image.width(), image.height()) // 2 >= TAILLE_MIN_NIVEAU:
+            image = image.scaled(image.width() // 2, image.height() // 2,
+                                 Qt.AspectRatioMode.IgnoreAspectRatio, Qt.TransformationMode.SmoothTransformation)
+            niveau += 1
+            self.niveau_pret.emit(niveau, image)
+
+    # Dans le fil principal (connexion en file) : les QPixmap n'existent que là
+    def ajouter_niveau(self, niveau, image):
+        if niveau == len(self.niveaux):
+            self.niveaux.append(QPixmap.fromImage(image))
+            self.niveaux_changes.emit()
+
+    # Niveau le plus réduit qui garde au moins un pixel d'image par pixel écran
+    def pour_echelle(self, echelle):
+        if echelle <= 0 or echelle >= 1:
+            return self.niveaux[0]
+        return self.niveaux[min(int(math.floor(math.log2(1 / echelle))), len(self.niveaux) - 1)]
+
+_niveaux_plans = OrderedDict()
+# les réductions en cours doivent finir avant la destruction des objets Qt à la sortie
+atexit.register(QThreadPool.globalInstance().waitForDone)
+
+# Niveaux d'un plan, partagés entre les items qui l'affichent (LRU sur NB_PLANS_NIVEAUX plans)
+def niveaux_plan(pixmap):
+    cle = pixmap.cacheKey()
+    if cle in _niveaux_plans:
+        _niveaux_plans.move_to_end(cle)
+    else:
+        _niveaux_plans[cle] = NiveauxPlan(pixmap)
+        while len(_niveaux_plans) > NB_PLANS_NIVEAUX:
+            _niveaux_plans.popitem(last=False)
+    return _niveaux_plans[cle]
+
+# Item graphique d'un plan ordinaire : peint le niveau réduit le plus proche du zoom,
+# limité à la zone exposée, au lieu de rééchantillonner le plan entier
+class PlanMipmap(QGraphicsItem):
+    def __init__(self, pixmap):
+        super().__init__()
+        self.plan = pixmap
+        self.niveaux = niveaux_plan(pixmap)
+        self.niveaux.niveaux_changes.connect(self.rafraichir)
+        self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemUsesExtendedStyleOption)
+        self.setAcceptedMouseButtons(Qt.MouseButton.NoButton)
+
+    def pixmap(self):
+        return self.plan
+
+    def rafraichir(self):
+        if not sip.isdeleted(self):
+            self.update()
+
+    def boundingRect(self):
+        return QRectF(0, 0, self.plan.width(), self.plan.height())
+
+    def paint(self, painter, option, widget=None):
+        niveau = self.niveaux.pour_echelle(painter.worldTransform().m11())
+        zone = option.exposedRect.intersected(self.boundingRect())
+        rapport_x = niveau.width() / self.plan.width()
+        rapport_y = niveau.height() / self.plan.height()
+        source = QRectF(zone.x() * rapport_x, zone.y() * rapport_y, zone.width() * rapport_x, zone.height() * rapport_y)
+        painter.drawPixmap(zone, niveau, source)